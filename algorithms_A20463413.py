@@ -1,134 +1,364 @@
-from csp_A20463413 import CSP
+from csp_A20463413 import CSP, board_box
+from search_A20463413 import Search, run_search, STATUSES
+from geometry_A20463413 import get_geometry
+from dlx_A20463413 import dancing_links_count
+from functools import partial
 import math
-import copy
+import csv
+import random
 
-# Starts the backtracking search by initializing an empty assignment board and then calling backtrack
+# Geometry of a normal 9x9 board, used by the validity checks when no other geometry is given
+GEO = get_geometry(3)
+
+# Starts the backtracking search on the values placed in csp
+# Returns (solution, nodes), solution is -1 if there is none, or TIMEOUT / NODE_LIMIT if the search ran out of budget
 # csp => CSP object
-def backtracking_search(csp : CSP) :
-    # Fill the assignment list with X's
-    assignment = []
-    for i in range(9) :
-        assignment.append(["X", "X", "X", "X", "X", "X", "X", "X", "X"])
+# stats => SearchStats object to fill in (None = no instrumentation)
+# time_limit => seconds the search may take (None = no limit)
+# node_limit => nodes the search may generate (None = no limit)
+# var_order / val_order / seed => variable and value ordering (see make_orders())
+def backtracking_search(csp : CSP, stats=None, time_limit=None, node_limit=None, var_order="first", val_order="ascending", seed=None) :
+    if not csp.consistent : # The known values already break a rule (or propagation found a contradiction)
+        return -1, 1
 
-    return backtrack(csp, assignment)
+    return run_search(backtrack(csp, stats, var_order, val_order, seed), time_limit, node_limit)
 
 
-# CSP back-tracking search algorithm
+# CSP back-tracking search algorithm, on the explicit stack search driver
+# Variables are assigned in board order (by default) and each value is checked against the values already placed
+# The assignment is kept in csp itself, so checking a value and checking for completion are both O(1)
+# Returns a Search object, ready to run()
 # csp => CSP object
-# assignment => assignment board to be filled
-# nodes => keeps track of how many search nodes were generated
-def backtrack(csp : CSP, assignment, nodes=0) :
-    nodes = nodes + 1
-    # Is assignment complete?
-    if is_valid_sudoku(assignment) and csp.compare_known(assignment):
-        return assignment, nodes
-
-    # Get the coordinates of the next variable to be assigned
-    var = -1
-    for row in range(9) :
-        for col in range(9) :
-            if assignment[row][col] == "X" :
-                var = (row, col)
-                break
+# stats => SearchStats object to fill in (None = no instrumentation)
+# var_order / val_order / seed => variable and value ordering (see make_orders())
+def backtrack(csp : CSP, stats=None, var_order="first", val_order="ascending", seed=None) :
+    select, order = make_orders(var_order, val_order, seed)
+    if stats is not None :
+        select = partial(stats.select, select)
 
-    for val in csp.constraints[var] :  # For each possible value in the variable's domain
-        #if csp.in_constraint(var, val) : # If value is consistent with assignment
-        assignment[var[0]][var[1]] = val # Assign the value to the variable
+    return Search(csp, select, place_consistent, stats, order)
 
-        old_constraints = csp.constraints[var] # Remember the old constraints in case this search path results in a failure
 
-        if is_valid(assignment, var[0], var[1]) :
-            #csp.update_constraints(var, val, 0) # update the constraints based on the new value that was assigned --- int
+# Returns the flat index of the first unassigned variable at or after start (-1 if there is none)
+# csp => CSP object
+# start => flat index to start looking from
+def next_unassigned(csp : CSP, start=0) :
+    values = csp.values
+    cells = csp.geo.cells
+    idx = start
+    while idx < cells and values[idx] != 0 :
+        idx = idx + 1
 
-            result, nodes = backtrack(csp, assignment, nodes) # Pass updated csp constraints and updated assignment to backtrack
-            if result != -1 : # If the result is not a failure then return it
-                return result, nodes
-            
-        csp.update_constraints(var, old_constraints, 1) # Update the constraints to be back to before the new value was assigned
-        assignment[var[0]][var[1]] = "X" # Reset the assignment back to being empty
-            
-    return -1, nodes # Return failure if there are no valid possible assignments
+    return idx if idx < cells else -1
 
 
+# Place val at var if it doesn't clash with a value already placed, without any inference
+# Returns False if it clashes
+# csp => CSP object
+# var => (row, col) index into the sudoku
+# val => the value to place
+def place_consistent(csp : CSP, var, val) :
+    if not csp.is_consistent(var, val) :
+        return False
 
+    csp.set_value(var[0] * csp.geo.size + var[1], val)
+    return True
 
 
-# Starts the backtracking search by initializing an empty assignment board and then calling backtrack
-# csp => CSP object
-def backtracking_search_mrv(csp : CSP) :
-    # Fill the assignment list with X's
-    assignment = []
-    for i in range(9) :
-        assignment.append(["X", "X", "X", "X", "X", "X", "X", "X", "X"])
 
-    return backtrack_mrv(csp, assignment)
 
 
-# CSP back-tracking search algorithm
+# Starts the backtracking search with the MRV heuristic
+# The search works directly on the domains stored in csp and uses its trail to undo failed assignments
+# Returns (solution, nodes) like backtracking_search()
 # csp => CSP object
-# assignment => assignment board to be filled
-# nodes => keeps track of how many search nodes were generated
-def backtrack_mrv(csp : CSP, assignment, nodes=0) :
-    nodes = nodes + 1
-    # Is assignment complete?
-    if is_valid_sudoku(assignment) and csp.compare_known(assignment):
-        return assignment, nodes
+# inference_type => what to do after every assignment (see inference())
+# stats => SearchStats object to fill in (None = no instrumentation)
+# time_limit => seconds the search may take (None = no limit)
+# node_limit => nodes the search may generate (None = no limit)
+# var_order / val_order / seed => variable and value ordering (see make_orders())
+def backtracking_search_mrv(csp : CSP, inference_type="fc", stats=None, time_limit=None, node_limit=None,
+                            var_order="mrv+degree", val_order="ascending", seed=None) :
+    if not csp.consistent : # The known values already break a rule (or left a variable with no legal values)
+        return -1, 1
 
-    # Get the coordinates of the next variable to be assigned using mrv()
-    var = mrv(csp)
+    # MAC starts from an arc consistent problem
+    if inference_type == "mac" and not csp.ac3() :
+        return -1, 1
 
+    return run_search(backtrack_mrv(csp, inference_type, stats, var_order, val_order, seed), time_limit, node_limit)
 
-    for val in csp.constraints[var] :  # For each possible value in the variable's domain
-        #if csp.in_constraint(var, val) : # If value is consistent with assignment
-        assignment[var[0]][var[1]] = val # Assign the value to the variable
 
-        old_constraints = csp.constraints[var] # Remember the old constraints in case this search path results in a failure
+# Starts the backtracking search that maintains arc consistency (MAC) with the MRV heuristic
+# csp => CSP object
+# stats => SearchStats object to fill in (None = no instrumentation)
+# time_limit => seconds the search may take (None = no limit)
+# node_limit => nodes the search may generate (None = no limit)
+# var_order / val_order / seed => variable and value ordering (see make_orders())
+def backtracking_search_mac(csp : CSP, stats=None, time_limit=None, node_limit=None, var_order="mrv+degree", val_order="ascending", seed=None) :
+    return backtracking_search_mrv(csp, "mac", stats, time_limit, node_limit, var_order, val_order, seed)
 
-        if is_valid(assignment, var[0], var[1]) :
-            #csp.update_constraints(var, val, 0) # update the constraints based on the new value that was assigned --- int
 
-            inferences, new_csp = inference(csp, var, val)
+# CSP back-tracking search algorithm with MRV (by default), on the explicit stack search driver
+# Returns a Search object, ready to run()
+# csp => CSP object
+# inference_type => what to do after every assignment (see inference())
+# stats => SearchStats object to fill in (None = no instrumentation)
+# var_order / val_order / seed => variable and value ordering (see make_orders())
+def backtrack_mrv(csp : CSP, inference_type="fc", stats=None, var_order="mrv+degree", val_order="ascending", seed=None) :
+    select, order = make_orders(var_order, val_order, seed)
+    apply = partial(inference, inference_type=inference_type)
+    if stats is not None :
+        select = partial(stats.select, select)
+        apply = partial(stats.propagate, apply)
 
-            if inferences == True :
-                result, nodes = backtrack(csp, assignment, nodes) # Pass updated csp constraints and updated assignment to backtrack
-                if result != -1 : # If the result is not a failure then return it
-                    return result, nodes
-            
-        csp.update_constraints(var, old_constraints, 1) # Update the constraints to be back to before the new value was assigned
-        assignment[var[0]][var[1]] = "X" # Reset the assignment back to being empty
-            
-    return -1, nodes # Return failure if there are no valid possible assignments
+    return Search(csp, select, apply, stats, order)
 
 
-# Return the variable with the fewest legal values left
+# Return the variable with the fewest legal values left (MRV)
+# Returns -1 if every variable has been assigned
 # csp => CSP object
 def mrv(csp : CSP) :
-    var = (0,0)
-    min_val = 9
-    for row in range(9) :
-        for col in range(9) :
-            l = len(csp.constraints[(row, col)])
-            if l < min_val and 1 > 1:
-                min_val = len(csp.constraints(var))
-                var = (row, col)
-    
+    idx = mrv_index(csp)
+    if idx == -1 :
+        return -1
+
+    return csp.geo.coords[idx]
+
+
+# Return the flat index of the variable with the fewest legal values left (MRV)
+# Ties are broken by the degree heuristic, i.e. the variable with the most unassigned peers
+# Returns -1 if every variable has been assigned
+# The degrees are kept up to date by the CSP (csp.free_peers), so a node costs one pass over the cells whatever the
+# number of peers or ties --- the pass itself still grows with the board (81 / 256 / 625 cells)
+# csp => CSP object
+# start => not used, every variable is looked at (it is there so mrv_index() can be given to Search)
+def mrv_index(csp : CSP, start=0) :
+    geo = csp.geo
+    domains = csp.domains
+    values = csp.values
+    freePeers = csp.free_peers
+
+    var = -1
+    min_val = geo.size + 1
+    degree = -1
+    for idx in range(geo.cells) :
+        if values[idx] != 0 :
+            continue
+
+        l = domains[idx].bit_count()
+        if l < min_val :
+            min_val = l
+            var = idx
+            degree = freePeers[idx]
+            if l <= 1 : # Nothing can beat a forced (or failed) variable
+                break
+        elif l == min_val and freePeers[idx] > degree :
+            var = idx
+            degree = freePeers[idx]
+
+    return var
+
+
+# Returns how many of the peers of idx have not been assigned yet --- O(1), the CSP keeps the counts
+# csp => CSP object
+# idx => flat index into the board
+def count_unassigned_peers(csp : CSP, idx) :
+    return csp.free_peers[idx]
+
+
+# Return the flat index of the variable with the fewest legal values left, without any tie-breaking
+# (the first one in board order wins)
+# Returns -1 if every variable has been assigned
+# csp => CSP object
+# start => not used, every variable is looked at
+def mrv_first(csp : CSP, start=0) :
+    domains = csp.domains
+    values = csp.values
+
+    var = -1
+    min_val = csp.geo.size + 1
+    for idx in range(csp.geo.cells) :
+        if values[idx] == 0 :
+            l = domains[idx].bit_count()
+            if l < min_val :
+                min_val = l
+                var = idx
+                if l <= 1 :
+                    break
+
     return var
 
 
-# Function to perform forward checking
+# Return the flat index of a variable with the fewest legal values left, picking one of the ties at random
+# Returns -1 if every variable has been assigned
+# csp => CSP object
+# start => not used, every variable is looked at
+# rng => random.Random object
+def mrv_random(csp : CSP, start=0, rng=random) :
+    domains = csp.domains
+    values = csp.values
+
+    ties = []
+    min_val = csp.geo.size + 1
+    for idx in range(csp.geo.cells) :
+        if values[idx] == 0 :
+            l = domains[idx].bit_count()
+            if l < min_val :
+                min_val = l
+                ties = [idx]
+            elif l == min_val :
+                ties.append(idx)
+
+    if not ties :
+        return -1
+
+    return rng.choice(ties)
+
+
+# Least constraining value: order the values of idx by how many unassigned peers still have them in their domain,
+# so the value that rules out the fewest options for the other variables is tried first
+# Returns a list of values
+# csp => CSP object
+# idx => flat index of the variable
+# vals => the values to order
+def lcv_order(csp : CSP, idx, vals) :
+    domains = csp.domains
+    values = csp.values
+    peers = [i for i in csp.geo.peers[idx] if values[i] == 0]
+
+    def ruled_out(val) :
+        bit = 1 << (val - 1)
+        return sum(1 for i in peers if domains[i] & bit)
+
+    return sorted(vals, key=ruled_out)
+
+
+# Try the values of a variable in random order
+# Returns a list of values
+# csp => CSP object
+# idx => flat index of the variable
+# vals => the values to order
+# rng => random.Random object
+def random_order(csp : CSP, idx, vals, rng=random) :
+    vals = list(vals)
+    rng.shuffle(vals)
+    return vals
+
+
+# Variable ordering strategies --- { name : select function for Search }
+# "first" = first unassigned variable in board order, "mrv" = fewest legal values, "mrv+degree" = MRV with ties
+# broken by the degree heuristic, "random" = MRV with ties broken at random
+VARIABLE_ORDERS = {
+    "first" : next_unassigned,
+    "mrv" : mrv_first,
+    "mrv+degree" : mrv_index,
+    "random" : mrv_random,
+}
+
+# Value ordering strategies --- { name : order function for Search (None = ascending) }
+VALUE_ORDERS = {
+    "ascending" : None,
+    "lcv" : lcv_order,
+    "random" : random_order,
+}
+
+
+# Build the select and order functions for Search from the names of the strategies
+# Returns (select, order)
+# var_order => name in VARIABLE_ORDERS
+# val_order => name in VALUE_ORDERS
+# seed => seed for the random strategies (None = a different order every run)
+def make_orders(var_order="first", val_order="ascending", seed=None) :
+    rng = random.Random(seed)
+
+    select = VARIABLE_ORDERS[var_order]
+    if var_order == "random" :
+        select = partial(select, rng=rng)
+
+    order = VALUE_ORDERS[val_order]
+    if val_order == "random" :
+        order = partial(order, rng=rng)
+
+    return select, order
+
+
+# Function to perform forward checking (and optionally more inference) after var is assigned val
+# The changes are made to csp in place and recorded in its trail, so the caller has to undo() them on failure
+# Returns False if a variable is left with no legal values
 # csp => CSP object
 # var => (row, col) index into constraints
-# val => the current value being tested in backtrack_mrv()
-def inference(csp : CSP, var, val) :
-    new_csp = copy.deepcopy(csp)
-    new_csp.update_constraints(var, val, 0)
+# val => the current value being tested by the search
+# inference_type => "fc" = forward checking only
+#                   "mac" = forward checking, then AC-3 starting from the arcs that point at the peers of var
+#                   "propagate" = forward checking, then the full constraint propagation rules
+def inference(csp : CSP, var, val, inference_type="fc") :
+    idx = var[0] * csp.geo.size + var[1]
+    if csp.values[idx] != 0 : # Already filled in (a known value), so nothing new can be inferred
+        return csp.values[idx] == val
+
+    if not csp.assign(idx, val) :
+        return False
+
+    if inference_type == "mac" :
+        # Forward checking already revised every arc that points at var
+        peers = csp.geo.peers
+        return csp.ac3([(xk, xj) for xj in peers[idx] for xk in peers[xj] if xk != idx])
+    if inference_type == "propagate" :
+        return csp.propagate()
+
+    return True
+
+
+
+
+
+# The known values of the puzzle on a fresh 2d board, whatever state csp has been left in by a search
+# (the known cells are placed when the CSP object is created and no search ever takes them out)
+# csp => CSP object
+def clue_board(csp : CSP) :
+    geo = csp.geo
+    board = [["X"] * geo.size for i in range(geo.size)]
+    for row, col in csp.known :
+        board[row][col] = csp.values[row * geo.size + col]
+
+    return board
+
+
+# Count the solutions of the puzzle, stopping early once limit of them have been found
+# Counts from the known values only, so it gives the same answer before and after csp has been searched
+# Runs on the Dancing Links solver, which is the fastest engine we have
+# Returns the count, or TIMEOUT / NODE_LIMIT if the search ran out of budget
+# csp => CSP object
+# limit => stop counting at this many solutions (None = count them all)
+# time_limit => seconds the search may take (None = no limit)
+# node_limit => nodes the search may generate (None = no limit)
+def count_solutions(csp : CSP, limit=2, time_limit=None, node_limit=None) :
+    count, nodes = dancing_links_count(CSP(clue_board(csp), box=csp.geo.box), limit, time_limit, node_limit)
+    return count
+
+
+# Does the puzzle have exactly one solution?
+# Works from the known values only, like count_solutions()
+# Returns True / False, or TIMEOUT / NODE_LIMIT if the search ran out of budget before it could tell
+# (so check for those before using the answer as a bool)
+# csp => CSP object
+# time_limit => seconds the search may take (None = no limit)
+# node_limit => nodes the search may generate (None = no limit)
+def has_unique_solution(csp : CSP, time_limit=None, node_limit=None) :
+    start = CSP(clue_board(csp), box=csp.geo.box)
+    if not start.consistent :
+        return False
+
+    # Constraint propagation only makes moves that every solution has to make,
+    # so if it filled in the whole board when the puzzle was set up there is exactly one solution
+    if start.is_complete() :
+        return True
 
-    for row in range(9) :
-        for col in range(9) :
-            if len(new_csp.constraints[(row, col)]) == 0 :
-                return False, new_csp
-    
-    return True, new_csp
+    count, nodes = dancing_links_count(start, 2, time_limit, node_limit)
+    if count in STATUSES :
+        return count
+    return count == 1
 
 
 
@@ -136,134 +366,184 @@ def inference(csp : CSP, var, val) :
 
 # Brute force algorithm
 # csp => CSP object
-# nodes => how many nodes were generated
-def bruteforce(csp : CSP) :
+# Returns (solution, nodes) like backtracking_search()
+# start => flat index to start looking for the next variable from (every variable before it is assigned)
+# depth => depth of this node in the search tree
+# stats => SearchStats object to fill in (None = no instrumentation)
+# budget => Budget object limiting the time and nodes (None = no limit)
+def bruteforce(csp : CSP, start=0, depth=0, stats=None, budget=None) :
+    if budget is not None :
+        status = budget.spend()
+        if status is not None : # Out of budget, the status goes back up just like a solution would
+            return status, 0
     nodes = 1
 
     # Get the next value to be assigned
-    row, col = -1, -1
-    for r in csp.sudoku :
-        row = row + 1
-        if 'X' in r :
-            col = r.index('X')
-            break
-    
+    if stats is None :
+        idx = next_unassigned(csp, start)
+        assign = csp.assign
+    else :
+        stats.enter(depth)
+        idx = stats.select(next_unassigned, csp, start)
+        assign = partial(stats.propagate, csp.assign)
+
     # Base case = no more values to assign
-    if col == -1 :
-        if is_valid_sudoku(csp.sudoku) and csp.compare_known(csp.sudoku) :
-            return csp.sudoku, nodes
+    if idx == -1 :
+        if csp.is_solved() and csp.compare_known() :
+            if stats is not None :
+                stats.solution_depth = depth
+            return csp.board(), nodes
         return -1, nodes
 
 
-    for val in csp.constraints[(row, col)] :
-        new_csp = copy.deepcopy(csp)
-        (new_csp.sudoku)[row][col] = val
-        new_csp.update_constraints((row, col), val, 0)
-        s,n = bruteforce(new_csp)
+    # The search runs on csp itself and the trail is used to roll back each failed value, so nothing is copied
+    for val in csp.legal_values(csp.geo.coords[idx]) :
+        mark = csp.mark()
+        assign(idx, val)
+        s,n = bruteforce(csp, idx + 1, depth + 1, stats, budget)
         nodes = nodes + n
         if s != -1 :
             return s,nodes
-        
+        csp.undo(mark)
+
     return -1, nodes
 
 
         
 
 
+# One character per value for the one line format, so boards up to 25x25 still take one character per cell
+CELL_CHARS = "X123456789ABCDEFGHIJKLMNOP"
+
+
 # Convert 2d array to string representation
 # sudoku => 2d array sudoku board
 def sudoku2str(sudoku) :
-    string = ""
-    for row in sudoku :
-        for x in row :
-            string = string + str(x)
-
-    return string
+    return "".join([CELL_CHARS[x] if type(x) is int else str(x) for row in sudoku for x in row])
 
 
 # Convert string to 2d array representation -- used in bruteforce()
+# Each character becomes one cell (as a str), the board is assumed to be square
 # string => string sudoku board
 def str2sudoku(string) :
-    sudoku = []
-    for x in range(9) :
-        sudoku.append(["X", "X", "X", "X", "X", "X", "X", "X", "X"])
+    size = math.isqrt(len(string))
+    return [list(string[i : i + size]) for i in range(0, size * size, size)]
 
-    for idx in range(len(string)) :
-        i = math.floor(idx / 9)
-        j = idx % 9
-        sudoku[i][j] = string[idx]
 
-    return sudoku
+# Lookup table for line2sudoku() --- character -> cell value ("X" = empty)
+LINE_CELLS = {CELL_CHARS[v] : v for v in range(1, len(CELL_CHARS))}
+LINE_CELLS.update({CELL_CHARS[v].lower() : v for v in range(10, len(CELL_CHARS))})
+LINE_CELLS.update({empty : "X" for empty in "X.0"})
 
 
-# Ensure that the given row is valid
-# sudoku => sudoku board 2d array
-# row => row index
-def check_row(sudoku, row):
-    # Set to store characters seen so far.
-    nums = []
+# Lengths a one line puzzle can have --- number of characters -> box size
+LINE_LENGTHS = {16 : 2, 81 : 3, 256 : 4, 625 : 5}
 
-    for i in range(9):
 
-        # If already encountered before, return false (aka not valid)
-        if sudoku[row][i] in nums:
-            return False
+# Convert a one line puzzle (81 characters, digits for known values and X, . or 0 for empty cells) into a 2d array
+# with int() values, the same way main() reads the csv files
+# Bigger boards use A, B, C, ... for the values after 9 (16 characters for 4x4, 256 for 16x16, 625 for 25x25)
+# Raises ValueError if the line has any other length, or a character that is neither empty nor a value on the board
+# (A on a 9x9 board)
+# line => string sudoku board
+def line2sudoku(line) :
+    line = line.strip()
+    if len(line) not in LINE_LENGTHS :
+        raise ValueError("a puzzle is 16, 81, 256 or 625 characters, not " + str(len(line)))
+    size = LINE_LENGTHS[len(line)] ** 2
+    for x in line :
+        cell = LINE_CELLS.get(x)
+        if cell is None or cell != "X" and cell > size :
+            raise ValueError("'" + x + "' is not a value on a " + str(size) + "x" + str(size) + " board")
 
-        if sudoku[row][i] != 'X':
-            nums.append(sudoku[row][i])
+    return [[LINE_CELLS[x] for x in row] for row in str2sudoku(line)]
 
-    return True
 
+# Read a sudoku csv file (one row per line, X for empty cells) into a 2d array with int() values
+# Raises ValueError if the board isn't square (see csp_A20463413.board_box()) or has a cell that is neither X
+# nor a value on the board
+# fname => path to the csv file
+def csv2sudoku(fname) :
+    sudoku = []
+    # Read the csv file into a 2d array
+    with open(fname, 'r', encoding='utf-8-sig') as csvFile :
+        csvReader = csv.reader(csvFile)
+        for row in csvReader :
+            if row : # Skip blank lines at the end of the file
+                sudoku.append(row)
+
+    size = board_box(sudoku) ** 2
+
+    # Convert str() numbers into int()
+    for row in range(len(sudoku)) :
+        for col in range(len(sudoku[row])) :
+            if sudoku[row][col] != "X" :
+                cell = sudoku[row][col].strip()
+                if not cell.isdigit() or not 1 <= int(cell) <= size :
+                    raise ValueError("'" + cell + "' at " + str((row, col)) + " is not a value on a " + str(size) + "x" + str(size) + " board")
+                sudoku[row][col] = int(cell)
 
-# Ensure that the given column is valid
+    return sudoku
+
+
+# Ensure that the given unit (row, column, or box) is valid
 # sudoku => sudoku board 2d array
-# col => column index
-def check_column(sudoku, col):
-    # Set to store characters seen so far.
-    nums = []
+# unit => index into geo.units
+# geo => Geometry object for the board size
+def check_unit(sudoku, unit, geo=GEO):
+    # Bitmask of the values seen so far
+    seen = 0
 
-    for i in range(9):
+    for row, col in geo.unit_coords[unit]:
+        x = sudoku[row][col]
+        if x != 'X':
+            bit = 1 << (x - 1)
 
-        # If already encountered before, return false (aka not valid)
-        if sudoku[i][col] in nums:
-            return False
+            # If already encountered before, return false (aka not valid)
+            if seen & bit:
+                return False
 
-        if sudoku[i][col] != 'X':
-            nums.append(sudoku[i][col])
+            seen |= bit
 
     return True
 
 
-# Ensure that the given box is valid
+# Ensure that the given row is valid
 # sudoku => sudoku board 2d array
-# startRow => row to start at
-# startCol => column to start at
-def check_box(sudoku, startRow, startCol):
-    # Set to store characters seen so far.
-    nums = []
+# row => row index
+# geo => Geometry object for the board size
+def check_row(sudoku, row, geo=GEO):
+    return check_unit(sudoku, row, geo)
 
-    # Loops through all the values in the box
-    for row in range(3):
-        for col in range(3):
-            curr = sudoku[row + startRow][col + startCol]
 
-            # If already encountered before, return false (aka not valid)
-            if curr in nums:
-                return False
+# Ensure that the given column is valid
+# sudoku => sudoku board 2d array
+# col => column index
+# geo => Geometry object for the board size
+def check_column(sudoku, col, geo=GEO):
+    return check_unit(sudoku, geo.size + col, geo)
 
-            if curr != 'X':
-                nums.append(curr)
 
-    return True
+# Ensure that the given box is valid
+# sudoku => sudoku board 2d array
+# startRow => row to start at
+# startCol => column to start at
+# geo => Geometry object for the board size
+def check_box(sudoku, startRow, startCol, geo=GEO):
+    return check_unit(sudoku, geo.cell_units[startRow * geo.size + startCol][2], geo)
 
 # Is the sudoku valid AND has no unfilled spaces?
 # sudoku => sudoku board 2d array
-def is_valid_sudoku(sudoku):
-    for i in range(9):
-        for j in range(9):
-            # If current row or current column or current 3x3 box is not valid, return false (aka not valid)
-            if any("X" in row for row in sudoku) or not is_valid(sudoku, i, j):
-                return False
+# geo => Geometry object for the board size
+def is_valid_sudoku(sudoku, geo=GEO):
+    for row, col in geo.coords:
+        if sudoku[row][col] == "X":
+            return False
+
+    # Every unit has to be valid
+    for unit in range(len(geo.units)):
+        if not check_unit(sudoku, unit, geo):
+            return False
 
     return True
 
@@ -272,9 +552,8 @@ def is_valid_sudoku(sudoku):
 # sudoku => sudoku board 2d array
 # row => row index
 # col => column index
-def is_valid(sudoku, row, col):
-    return (check_row(sudoku, row) and check_column(sudoku, col) and
-            check_box(sudoku, row - row % 3, col - col % 3))
-
-
-
+# geo => Geometry object for the board size
+def is_valid(sudoku, row, col, geo=GEO):
+    units = geo.cell_units[row * geo.size + col]
+    return (check_unit(sudoku, units[0], geo) and check_unit(sudoku, units[1], geo) and
+            check_unit(sudoku, units[2], geo))
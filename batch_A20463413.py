@@ -0,0 +1,279 @@
+import argparse
+import os
+import sys
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from algorithms_A20463413 import line2sudoku, csv2sudoku, sudoku2str
+from engines_A20463413 import ENGINES, DEFAULT_ENGINE, solve
+from search_A20463413 import STATUSES
+from cache_A20463413 import SolutionCache, NO_SOLUTION, restore
+import vector_A20463413 as vector
+
+
+# Marks the result of a line that isn't a puzzle, the rest of the result line says what is wrong with it
+ERROR = "error: "
+
+
+# Read every puzzle to be solved
+# Returns a list of (name, sudoku) pairs in input order
+# A line (or csv file) that isn't a puzzle raises ValueError with its line number (file name), unless keep_bad is set:
+# it is then returned in its place as (name, message), message being a string that starts with the line number
+# (file name)
+# path => a file with one puzzle per line (81 characters), or a directory of csv files
+# keep_bad => keep going past lines and files that aren't puzzles
+def read_puzzles(path, keep_bad=False) :
+    puzzles = []
+    if os.path.isdir(path) :
+        for fname in sorted(os.listdir(path)) :
+            if not fname.endswith(".csv") :
+                continue
+            try :
+                puzzles.append((fname, csv2sudoku(os.path.join(path, fname))))
+            except ValueError as e :
+                if not keep_bad :
+                    raise ValueError(os.path.join(path, fname) + ": " + str(e))
+                puzzles.append((fname, fname + ": " + str(e)))
+        return puzzles
+
+    with open(path, 'r', encoding='utf-8-sig') as f :
+        for lineNum, line in enumerate(f, 1) :
+            line = line.strip()
+            if not line or line.startswith("#") : # Skip blank lines and comments
+                continue
+            try :
+                puzzles.append((str(lineNum), line2sudoku(line)))
+            except ValueError as e :
+                if not keep_bad :
+                    raise ValueError(path + ", line " + str(lineNum) + ": " + str(e))
+                puzzles.append((str(lineNum), "line " + str(lineNum) + ": " + str(e)))
+
+    return puzzles
+
+
+# Solve one puzzle and time it (runs inside the worker processes)
+# Returns (solution, nodes, seconds), solution is the one line string of the solved board or -1,
+# or TIMEOUT / NODE_LIMIT if the budget ran out first
+# A line that wasn't a puzzle (its message from read_puzzles() in place of the board) gives ERROR + message,
+# and so does a board the solver rejects (ValueError), so one bad puzzle can't stop a batch
+# job => (sudoku, engine name) or (sudoku, engine name, time limit, node limit)
+def solve_timed(job) :
+    sudoku, engine = job[0], job[1]
+    if isinstance(sudoku, str) :
+        return ERROR + sudoku, 0, 0.0
+    limits = job[2:]
+    timeStart = timeit.default_timer()
+    try :
+        solution, nodes = solve(sudoku, engine, *limits)
+    except ValueError as e :
+        return ERROR + str(e), 0, timeit.default_timer() - timeStart
+    elapsedTimeInSec = timeit.default_timer() - timeStart
+
+    if solution == -1 or solution in STATUSES :
+        return solution, nodes, elapsedTimeInSec
+
+    return sudoku2str(solution), nodes, elapsedTimeInSec
+
+
+# Solve a list of puzzles across a pool of worker processes
+# The puzzles are handed out in chunks and the results come back in the same order as the input
+# Returns (results, seconds) where results is a list of solve_timed() results
+# sudokus => list of 2d array sudoku boards
+# engine => name of the solver in ENGINES
+# workers => number of worker processes (None = one per CPU, 1 = solve in this process)
+# chunksize => how many puzzles are sent to a worker at once (None = pick one from the batch size)
+# time_limit => seconds each puzzle may take (None = no limit)
+# node_limit => nodes each puzzle may generate (None = no limit)
+def solve_batch(sudokus, engine=DEFAULT_ENGINE, workers=None, chunksize=None, time_limit=None, node_limit=None) :
+    jobs = [(sudoku, engine, time_limit, node_limit) for sudoku in sudokus]
+    if workers is None :
+        workers = os.cpu_count() or 1
+    if chunksize is None :
+        chunksize = max(1, len(jobs) // (workers * 4))
+
+    timeStart = timeit.default_timer()
+    if workers == 1 :
+        results = [solve_timed(job) for job in jobs]
+    else :
+        with ProcessPoolExecutor(max_workers=workers) as pool :
+            results = list(pool.map(solve_timed, jobs, chunksize=chunksize))
+    elapsedTimeInSec = timeit.default_timer() - timeStart
+
+    return results, elapsedTimeInSec
+
+
+# Solve a list of puzzles through a SolutionCache
+# Every puzzle is looked up first (in this process), then each canonical puzzle that missed is solved once
+# on the worker pool and cached, so repeated and equivalent puzzles in the same batch are only solved once
+# Returns (results, seconds) like solve_batch(), hits take no nodes and their lookup time --- so do the later copies
+# of a puzzle that missed, only the first copy is charged the nodes and time (lookup + solve) of solving it
+# sudokus => list of 2d array sudoku boards
+# cache => SolutionCache object
+# the other arguments are the same as solve_batch()
+def solve_batch_cached(sudokus, cache : SolutionCache, engine=DEFAULT_ENGINE, workers=None, chunksize=None, time_limit=None, node_limit=None) :
+    timeStart = timeit.default_timer()
+
+    lookups = []
+    missed = {} # key -> position in the list of puzzles to solve
+    for sudoku in sudokus :
+        lookupStart = timeit.default_timer()
+        key, transform, solution = cache.lookup(sudoku)
+        lookups.append((key, transform, solution, timeit.default_timer() - lookupStart))
+        if solution is None and key not in missed :
+            missed[key] = len(missed)
+
+    solved, seconds = solve_batch([line2sudoku(key) for key in missed], engine, workers, chunksize, time_limit, node_limit)
+    for key, i in missed.items() :
+        solution = solved[i][0]
+        if solution not in STATUSES :
+            cache.put(key, NO_SOLUTION if solution == -1 else solution)
+
+    results = []
+    charged = set() # Missed keys whose solve has been counted
+    for key, transform, solution, lookupTime in lookups :
+        nodes = 0
+        if solution is None :
+            solution, nodes, solveTime = solved[missed[key]]
+            if key in charged :
+                nodes = 0
+                if solution not in STATUSES : # Answered from the cache like any other hit
+                    cache.count_repeat()
+            else :
+                charged.add(key)
+                lookupTime = lookupTime + solveTime
+            if solution in STATUSES :
+                results.append((solution, nodes, lookupTime))
+                continue
+            if solution == -1 :
+                solution = NO_SOLUTION
+
+        board = restore(solution, transform)
+        results.append((-1 if board == -1 else sudoku2str(board), nodes, lookupTime))
+
+    return results, timeit.default_timer() - timeStart
+
+
+# Solve a list of puzzles (all the same size) with the vectorized engine
+# Propagation runs on every puzzle at once in this process, then the puzzles it didn't finish go to solve_batch()
+# Returns (results, seconds) like solve_batch(), the puzzles finished by propagation share its time equally
+# Needs numpy
+# sudokus => list of 2d array sudoku boards, or a (puzzles, cells) uint8 array of their values (see vector_A20463413.propagate_batch())
+# the other arguments are the same as solve_batch(), engine is used for the puzzles propagation didn't finish
+def solve_batch_vectorized(sudokus, engine=DEFAULT_ENGINE, workers=None, chunksize=None, time_limit=None, node_limit=None) :
+    timeStart = timeit.default_timer()
+    propagated, stalled = vector.propagate_batch(sudokus)
+    share = (timeit.default_timer() - timeStart) / len(sudokus) if len(sudokus) else 0.0
+
+    searched, seconds = solve_batch([board for i, board in stalled], engine, workers, chunksize, time_limit, node_limit)
+    results = [None if result is None else (-1 if result[0] == -1 else sudoku2str(result[0]), 0, share) for result in propagated]
+    for (i, board), result in zip(stalled, searched) :
+        results[i] = result
+
+    return results, timeit.default_timer() - timeStart
+
+
+# Returns the p-th percentile (0-100) of a list of numbers, using the nearest rank
+# vals => list of numbers
+# p => percentile
+def percentile(vals, p) :
+    if not vals :
+        return 0.0
+    vals = sorted(vals)
+    rank = max(1, -(-len(vals) * p // 100)) # ceil(len * p / 100)
+    return vals[int(rank) - 1]
+
+
+# Is this the result of a line that wasn't a puzzle?
+# solution => first item of a solve_timed() result
+def is_error(solution) :
+    return isinstance(solution, str) and solution.startswith(ERROR)
+
+
+# Aggregate statistics for a batch
+# results => list of solve_timed() results
+# elapsedTimeInSec => wall time for the whole batch
+def summarize(results, elapsedTimeInSec) :
+    latencies = [r[2] for r in results]
+    return {
+        "puzzles" : len(results),
+        "solved" : sum(1 for r in results if r[0] != -1 and r[0] not in STATUSES and not is_error(r[0])),
+        "aborted" : sum(1 for r in results if r[0] in STATUSES),
+        "errors" : sum(1 for r in results if is_error(r[0])),
+        "seconds" : elapsedTimeInSec,
+        "puzzles_per_sec" : len(results) / elapsedTimeInSec if elapsedTimeInSec > 0 else 0.0,
+        "p50_latency" : percentile(latencies, 50),
+        "p99_latency" : percentile(latencies, 99),
+        "total_nodes" : sum(r[1] for r in results),
+    }
+
+
+# Print the statistics returned by summarize()
+# stats => dictionary from summarize()
+# out => file to print to
+def show_summary(stats, out=sys.stderr) :
+    errors = (", " + str(stats["errors"]) + " not puzzles") if stats.get("errors") else ""
+    print("Puzzles: " + str(stats["puzzles"]) + " (" + str(stats["solved"]) + " solved, " + str(stats["aborted"]) + " out of budget" + errors + ")", file=out)
+    print("Total time: " + str(stats["seconds"]) + " seconds", file=out)
+    print("Throughput: " + str(stats["puzzles_per_sec"]) + " puzzles/sec", file=out)
+    print("Latency p50: " + str(stats["p50_latency"]) + " seconds", file=out)
+    print("Latency p99: " + str(stats["p99_latency"]) + " seconds", file=out)
+    print("Number of search tree nodes generated: " + str(stats["total_nodes"]), file=out)
+
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Solve many sudoku puzzles across a pool of worker processes.")
+    parser.add_argument("input", help="file with one 81 character puzzle per line, or a directory of csv files")
+    parser.add_argument("-e", "--engine", choices=sorted(ENGINES), default=DEFAULT_ENGINE, help="solver to use (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: one per CPU)")
+    parser.add_argument("-c", "--chunksize", type=int, default=None, help="puzzles sent to a worker at once")
+    parser.add_argument("-o", "--output", default=None, help="file to write the solutions to (default: stdout)")
+    parser.add_argument("-t", "--time-limit", type=float, default=None, help="seconds each puzzle may take (default: no limit)")
+    parser.add_argument("-n", "--node-limit", type=int, default=None, help="search nodes each puzzle may generate (default: no limit)")
+    parser.add_argument("--vectorized", action="store_true", help="propagate every puzzle at once with numpy first, searching only the ones left over")
+    parser.add_argument("--cache", action="store_true", help="look every puzzle up in a solution cache first (equivalent puzzles share an entry)")
+    parser.add_argument("--cache-db", default=None, help="sqlite file backing the solution cache (implies --cache)")
+    parser.add_argument("--cache-size", type=int, default=10000, help="entries kept in memory by the solution cache (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.vectorized and not vector.available() :
+        parser.error("--vectorized needs numpy")
+    if args.vectorized and (args.cache or args.cache_db) :
+        parser.error("--vectorized can't be used with the solution cache")
+
+    # Lines that aren't puzzles are left out of the solving and get an error line in the output instead
+    puzzles = read_puzzles(args.input, keep_bad=True)
+    sudokus = [p[1] for p in puzzles if not isinstance(p[1], str)]
+    cache = None
+    if args.vectorized :
+        solved, elapsedTimeInSec = solve_batch_vectorized(sudokus, args.engine, args.workers, args.chunksize,
+                                                          args.time_limit, args.node_limit)
+    elif args.cache or args.cache_db :
+        cache = SolutionCache(args.cache_size, args.cache_db)
+        solved, elapsedTimeInSec = solve_batch_cached(sudokus, cache, args.engine, args.workers, args.chunksize,
+                                                      args.time_limit, args.node_limit)
+        cache.close()
+    else :
+        solved, elapsedTimeInSec = solve_batch(sudokus, args.engine, args.workers, args.chunksize,
+                                               args.time_limit, args.node_limit)
+    solved = iter(solved)
+    results = [solve_timed((p[1], args.engine)) if isinstance(p[1], str) else next(solved) for p in puzzles]
+
+    # One solution per line, in input order ("timeout" / "node limit" for the puzzles that ran out of budget,
+    # "error: line N: ..." for the lines that aren't puzzles)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try :
+        for result in results :
+            if result[0] == -1 :
+                out.write("no solution\n")
+            else :
+                out.write(result[0] + "\n")
+    finally :
+        if args.output :
+            out.close()
+
+    show_summary(summarize(results, elapsedTimeInSec))
+    if cache is not None :
+        cache.show_stats(sys.stderr)
+
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,246 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+import tracemalloc
+from algorithms_A20463413 import csv2sudoku, line2sudoku
+from engines_A20463413 import ENGINES, solve
+from batch_A20463413 import read_puzzles
+
+
+# The puzzles shipped with the project
+TESTCASES = ["testcase" + str(i) + ".csv" for i in range(1, 8)]
+
+# Bigger boards, so the per-node cost of the searches shows how it grows with the board (20 / 39 / 64 peers and
+# 81 / 256 / 625 cells on a 9x9 / 16x16 / 25x25 board) --- { name : one line puzzle }
+# Known gap: the MRV orderings still look at every cell once per node (algorithms_A20463413.mrv_index()), only the
+# degree tie-break is O(1), so their cost per node grows with the number of cells rather than the number of peers
+LARGE_PUZZLES = {
+    "16x16" : "XXX5XGX2X3XAXX8X8X2XX4EXFXX5XCXX6XGC3A8XBX1XXXXXXA4XXFXX8XX62X53XX5XGXXX2DX8XXX7FXXXXXD67XXEXXXGE79DXX1A3XXXC2XXX3XX82XXXAXX5D4B9F8XB3XD4XACXXEXXX3XE9XXX8X2BX76XXXXCX2XXGEXXX3X2XXEAX6XX13XXXXX3X1XXXXCXXXXFXX5GXXX5X3XDXBXXXX1X2DXX6XGXXX1XEXC5XX8X1AXXXXXX6XX",
+    "25x25" : "X4AXX6DBXJXXXEXXGKNXHI1XXXKL5XAHXXCXXXB9OXXM6EX24GXXXXXXEG41KNJ5X2XXDXXAMXXXGXXNIX82FLOX7XBA5XXXJCXXXX1BX3KMNXAFCGXXXXEHXXX59JXOX5L6CEXXX3X2XXXIXXXXF1XIPX4X1XGDXE9XJHCOL5XXK7XXFEXXXJNXXHX5IXPXXXXG4XOCLXCGBX5PXO6XA4XF78XNJXEX21XDXXXX9X4XX7FXXMXAELXXX5XHX16G4XXXXX2XX8NEFOCXXXXXXGFOXMAHX96LXNXK47X583EPXXXXPEXOXXM4IXXXXDXLXBXXXMX34A8BXL7J5HXEX2PCXOGXXXXL9XXXNXXX8XXXF3XMXXX142JXX5XXXLEXXXXGXX1X9XXM2I8OXEXL3MXXJ82KXXXXXXOIPX59XIX4N9XXDBX3ME8X75XXXFKXXXBCXXGNXXOXDXFX56XLX84X71XXXFX8XXIX9XJX6XMXN4CXXGADXXBOXXXXCXXX61XXXX2XAXXXXXXXXXXO36ME9NLXXXAXXXXPGHX8XXXXXXXX5HMJXX9XB7XXOXXXXJXX9XX1XX7XXBLX6XXXXNXMXM6E1F7LXXX3K2ANOC54XXJDB",
+}
+
+# Engines benchmarked when none are asked for (brute force takes minutes on most of the testcases)
+DEFAULT_ENGINES = [name for name in ENGINES if name != "bruteforce"]
+
+# Columns of a report, in the order they are written to csv files
+FIELDS = ["puzzle", "engine", "solved", "nodes", "median_time", "min_time", "nodes_per_sec", "peak_memory"]
+
+# Most microseconds importing each command line module may take (the cumulative time from python -X importtime),
+# checked by --startup --- the optional and heavy imports (numpy, cProfile / pstats) are only done when used
+STARTUP_BUDGETS = {
+    "cs480_P02_A20463413" : 30000,
+    "batch_A20463413" : 100000,
+    "stream_A20463413" : 100000,
+    "packed_A20463413" : 100000,
+    "generator_A20463413" : 100000,
+    "parallel_A20463413" : 100000,
+    "portfolio_A20463413" : 100000,
+    "service_A20463413" : 150000,
+}
+
+
+# Load the shipped testcases (from the same directory as this file) and LARGE_PUZZLES, plus any extra corpus
+# Returns a list of (name, sudoku) pairs
+# corpus => list of paths, each a file with one puzzle per line or a directory of csv files
+def load_puzzles(corpus=()) :
+    here = os.path.dirname(os.path.abspath(__file__))
+    puzzles = [(name, csv2sudoku(os.path.join(here, name))) for name in TESTCASES]
+    puzzles.extend((name, line2sudoku(line)) for name, line in LARGE_PUZZLES.items())
+    for path in corpus :
+        for name, sudoku in read_puzzles(path) :
+            puzzles.append((os.path.basename(path) + ":" + name, sudoku))
+
+    return puzzles
+
+
+# Benchmark one engine on one puzzle
+# The timed runs come after the warmup runs, and peak memory is measured in one extra run
+# so that tracemalloc doesn't slow down the timed ones
+# Returns one report row (see FIELDS)
+# name => name of the puzzle
+# sudoku => 2d array sudoku board
+# engine => name of the solver in ENGINES
+# repeat => number of timed runs
+# warmup => number of untimed runs first
+def bench_one(name, sudoku, engine, repeat=5, warmup=1) :
+    for i in range(warmup) :
+        solve(sudoku, engine)
+
+    times = []
+    for i in range(repeat) :
+        timeStart = timeit.default_timer()
+        solution, nodes = solve(sudoku, engine)
+        times.append(timeit.default_timer() - timeStart)
+
+    tracemalloc.start()
+    solve(sudoku, engine)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    median = statistics.median(times)
+    return {
+        "puzzle" : name,
+        "engine" : engine,
+        "solved" : solution != -1,
+        "nodes" : nodes,
+        "median_time" : median,
+        "min_time" : min(times),
+        "nodes_per_sec" : nodes / median if median > 0 else 0.0,
+        "peak_memory" : peak,
+    }
+
+
+# Benchmark every engine on every puzzle
+# Returns a report --- { "meta" : {...}, "results" : [rows] }
+# puzzles => list of (name, sudoku) pairs
+# engines => list of names of solvers in ENGINES
+# repeat => number of timed runs per puzzle and engine
+# warmup => number of untimed runs first
+# out => where to print progress (None = nowhere)
+def run_benchmark(puzzles, engines=DEFAULT_ENGINES, repeat=5, warmup=1, out=None) :
+    results = []
+    for engine in engines :
+        for name, sudoku in puzzles :
+            row = bench_one(name, sudoku, engine, repeat, warmup)
+            results.append(row)
+            if out is not None :
+                print(engine + " " + name + ": " + str(row["nodes"]) + " nodes, " + str(row["median_time"]) + " seconds", file=out)
+
+    meta = {
+        "python" : platform.python_version(),
+        "platform" : platform.platform(),
+        "repeat" : repeat,
+        "warmup" : warmup,
+    }
+    return {"meta" : meta, "results" : results}
+
+
+# Save a report as json, or as csv if the file name ends in .csv (the meta data is only kept in json)
+# report => report from run_benchmark()
+# fname => path to write to
+def save_report(report, fname) :
+    if fname.endswith(".csv") :
+        with open(fname, 'w', newline='') as f :
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(report["results"])
+    else :
+        with open(fname, 'w') as f :
+            json.dump(report, f, indent=2)
+
+
+# Load a report saved by save_report()
+# fname => path to a .json or .csv report
+def load_report(fname) :
+    if not fname.endswith(".csv") :
+        with open(fname, 'r') as f :
+            return json.load(f)
+
+    results = []
+    with open(fname, 'r', newline='') as f :
+        for row in csv.DictReader(f) :
+            row["solved"] = row["solved"] == "True"
+            row["nodes"] = int(row["nodes"])
+            for key in ["median_time", "min_time", "nodes_per_sec", "peak_memory"] :
+                row[key] = float(row[key])
+            results.append(row)
+
+    return {"meta" : {}, "results" : results}
+
+
+# Compare two reports and list every puzzle/engine pair that got slower (median time), needed more nodes,
+# or stopped solving the puzzle
+# Returns a list of (puzzle, engine, what, old value, new value)
+# old / new => reports from run_benchmark() or load_report()
+# threshold => allowed relative increase before something counts as a regression (0.1 = 10%)
+def compare_reports(old, new, threshold=0.1) :
+    before = {(row["puzzle"], row["engine"]) : row for row in old["results"]}
+    regressions = []
+    for row in new["results"] :
+        key = (row["puzzle"], row["engine"])
+        if key not in before :
+            continue
+        prev = before[key]
+        if prev["solved"] and not row["solved"] :
+            regressions.append((key[0], key[1], "solved", True, False))
+        for what in ["median_time", "nodes"] :
+            if row[what] > prev[what] * (1 + threshold) :
+                regressions.append((key[0], key[1], what, prev[what], row[what]))
+
+    return regressions
+
+
+# Time importing a module in a fresh interpreter with python -X importtime
+# Returns the cumulative import time in microseconds (the median of repeat runs)
+# module => name of a module in the same directory as this file
+# repeat => number of fresh interpreters to start
+def import_time(module, repeat=5) :
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for i in range(repeat) :
+        run = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], cwd=here,
+                             capture_output=True, text=True, check=True)
+        for line in run.stderr.splitlines() :
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == module :
+                times.append(int(fields[1]))
+
+    return statistics.median(times)
+
+
+# Check the import time of every module in budgets
+# Returns a list of (module, microseconds, budget) for the modules that went over their budget
+# budgets => { module : most microseconds }
+# repeat => fresh interpreters per module
+# out => where to print every import time (None = nowhere)
+def check_startup(budgets=STARTUP_BUDGETS, repeat=5, out=None) :
+    over = []
+    for module, budget in budgets.items() :
+        usec = import_time(module, repeat)
+        if out is not None :
+            print(module + ": " + str(usec) + " us (budget " + str(budget) + " us)", file=out)
+        if usec > budget :
+            over.append((module, usec, budget))
+
+    return over
+
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Benchmark the sudoku solvers, or compare two saved benchmark reports.")
+    parser.add_argument("corpus", nargs="*", help="extra puzzle files (one puzzle per line) or directories of csv files")
+    parser.add_argument("-e", "--engines", nargs="+", choices=sorted(ENGINES), default=DEFAULT_ENGINES, help="solvers to benchmark (default: all but bruteforce)")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="timed runs per puzzle (default: %(default)s)")
+    parser.add_argument("-w", "--warmup", type=int, default=1, help="untimed runs per puzzle first (default: %(default)s)")
+    parser.add_argument("-o", "--output", default=None, help="save the report to this .json or .csv file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two saved reports instead of running a benchmark")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative increase that counts as a regression (default: %(default)s)")
+    parser.add_argument("--startup", action="store_true", help="check the import time of the command line modules against STARTUP_BUDGETS instead of running a benchmark")
+    args = parser.parse_args(argv)
+
+    if args.startup :
+        over = check_startup(STARTUP_BUDGETS, args.repeat, sys.stdout)
+        for module, usec, budget in over :
+            print("OVER BUDGET " + module + ": " + str(usec) + " us > " + str(budget) + " us")
+        print(str(len(over)) + " module(s) over budget")
+        sys.exit(1 if over else 0)
+
+    if args.compare :
+        regressions = compare_reports(load_report(args.compare[0]), load_report(args.compare[1]), args.threshold)
+        for puzzle, engine, what, before, after in regressions :
+            print("REGRESSION " + engine + " " + puzzle + ": " + what + " " + str(before) + " -> " + str(after))
+        print(str(len(regressions)) + " regression(s) found")
+        sys.exit(1 if regressions else 0)
+
+    report = run_benchmark(load_puzzles(args.corpus), args.engines, args.repeat, args.warmup, sys.stdout)
+    if args.output :
+        save_report(report, args.output)
+
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,175 @@
+import math
+import sqlite3
+import timeit
+from collections import OrderedDict
+from algorithms_A20463413 import sudoku2str, line2sudoku
+from engines_A20463413 import DEFAULT_ENGINE, solve
+from geometry_A20463413 import get_geometry
+from search_A20463413 import STATUSES
+from symmetry_A20463413 import canonical_form, invert_transform, board2flat, flat2board
+
+
+# Stored in place of the solution for puzzles that have none
+NO_SOLUTION = "-"
+
+
+# Solutions of canonical puzzles (see symmetry_A20463413.canonical_form()), so a puzzle hits the cache whenever an
+# equivalent puzzle was solved before, whatever its transposition, band/stack/row/column order or value labels
+# Keys and solutions are one line strings in canonical coordinates
+# exact => puzzles looked up before, so a repeated puzzle skips canonical_form() --- { one line puzzle : (key, transform) },
+#          least recently used first
+# memory => the in-memory tier --- { key : solution }, least recently used first
+# maxsize => most entries kept in memory (in exact and in memory each)
+# db => sqlite connection for the on-disk tier (None = memory only)
+# hits / diskHits / misses => lookups answered from memory / from disk / not at all
+# lookupTime => seconds spent in lookup() (canonical form included)
+class SolutionCache :
+    def __init__(self, maxsize=10000, path=None) :
+        self.exact = OrderedDict()
+        self.memory = OrderedDict()
+        self.maxsize = maxsize
+        self.db = None
+        if path is not None :
+            self.db = sqlite3.connect(path)
+            self.db.execute("CREATE TABLE IF NOT EXISTS solutions (puzzle TEXT PRIMARY KEY, solution TEXT NOT NULL)")
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+        self.lookupTime = 0.0
+
+
+    # Returns the cached solution for key, or None
+    # key => one line canonical puzzle
+    def get(self, key) :
+        memory = self.memory
+        if key in memory :
+            memory.move_to_end(key)
+            self.hits = self.hits + 1
+            return memory[key]
+
+        if self.db is not None :
+            row = self.db.execute("SELECT solution FROM solutions WHERE puzzle = ?", (key,)).fetchone()
+            if row is not None :
+                self.diskHits = self.diskHits + 1
+                self.remember(key, row[0])
+                return row[0]
+
+        self.misses = self.misses + 1
+        return None
+
+
+    # Count a lookup that missed as a memory hit after all
+    # For a batch that looked up the same puzzle more than once before solving it: only the first copy is solved,
+    # the others are answered from the cache once it is stored
+    def count_repeat(self) :
+        self.misses = self.misses - 1
+        self.hits = self.hits + 1
+
+
+    # Store the solution for key in both tiers
+    # key => one line canonical puzzle
+    # solution => one line canonical solution, or NO_SOLUTION
+    def put(self, key, solution) :
+        self.remember(key, solution)
+        if self.db is not None :
+            self.db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?)", (key, solution))
+            self.db.commit()
+
+
+    # Store the solution for key in memory only, dropping the least recently used entry if it is full
+    def remember(self, key, solution) :
+        memory = self.memory
+        memory[key] = solution
+        memory.move_to_end(key)
+        if len(memory) > self.maxsize :
+            memory.popitem(last=False)
+
+
+    # Look a puzzle up
+    # Returns (key, transform, solution), solution is None if it isn't cached
+    # sudoku => 2d array sudoku board
+    def lookup(self, sudoku) :
+        timeStart = timeit.default_timer()
+        exact = self.exact
+        line = sudoku2str(sudoku)
+        if line in exact :
+            exact.move_to_end(line)
+            key, transform = exact[line]
+        else :
+            geo = get_geometry(math.isqrt(len(sudoku)))
+            canonical, transform = canonical_form(sudoku, geo)
+            key = sudoku2str(flat2board(canonical, geo))
+            exact[line] = (key, transform)
+            if len(exact) > self.maxsize :
+                exact.popitem(last=False)
+        solution = self.get(key)
+        self.lookupTime = self.lookupTime + timeit.default_timer() - timeStart
+
+        return key, transform, solution
+
+
+    # Hit rate and lookup latency so far
+    def stats(self) :
+        lookups = self.hits + self.diskHits + self.misses
+        return {
+            "lookups" : lookups,
+            "hits" : self.hits,
+            "disk_hits" : self.diskHits,
+            "misses" : self.misses,
+            "hit_rate" : (self.hits + self.diskHits) / lookups if lookups else 0.0,
+            "lookup_latency" : self.lookupTime / lookups if lookups else 0.0,
+        }
+
+
+    # Print the statistics returned by stats()
+    # out => file to print to
+    def show_stats(self, out) :
+        stats = self.stats()
+        print("Cache lookups: " + str(stats["lookups"]) + " (" + str(stats["hits"]) + " memory hits, " + str(stats["disk_hits"]) + " disk hits)", file=out)
+        print("Cache hit rate: " + str(stats["hit_rate"]), file=out)
+        print("Cache lookup latency: " + str(stats["lookup_latency"]) + " seconds", file=out)
+
+
+    def close(self) :
+        if self.db is not None :
+            self.db.close()
+            self.db = None
+
+
+
+
+
+# ---- The functions below are not part of the class ---- #
+
+# Map a cached solution back onto the puzzle it was looked up for
+# Returns the solved 2d board, or -1 if the puzzle has no solution
+# solution => one line canonical solution, or NO_SOLUTION
+# transform => transform returned by lookup()
+def restore(solution, transform) :
+    if solution == NO_SOLUTION :
+        return -1
+
+    geo = get_geometry(math.isqrt(len(transform[1])))
+    return flat2board(invert_transform(board2flat(line2sudoku(solution)), transform, geo), geo)
+
+
+# Solve a puzzle through the cache, solving (and caching) its canonical form on a miss
+# Returns (solution, nodes) like engines_A20463413.solve(), nodes is 0 on a hit
+# Puzzles that run out of budget are not cached
+# sudoku => 2d array sudoku board
+# cache => SolutionCache object
+# engine => name of the solver in ENGINES
+# time_limit => seconds the search may take (None = no limit)
+# node_limit => nodes the search may generate (None = no limit)
+def cached_solve(sudoku, cache : SolutionCache, engine=DEFAULT_ENGINE, time_limit=None, node_limit=None) :
+    key, transform, solution = cache.lookup(sudoku)
+    if solution is not None :
+        return restore(solution, transform), 0
+
+    solution, nodes = solve(line2sudoku(key), engine, time_limit, node_limit)
+    if solution in STATUSES :
+        return solution, nodes
+
+    solution = NO_SOLUTION if solution == -1 else sudoku2str(solution)
+    cache.put(key, solution)
+    return restore(solution, transform), nodes
@@ -1,48 +1,96 @@
+import argparse
 import sys
-import csv
-from algorithms_A20463413 import *
-from csp_A20463413 import CSP
 import timeit
+from functools import partial
+from algorithms_A20463413 import (bruteforce, backtracking_search, backtracking_search_mrv, backtracking_search_mac,
+                                  csv2sudoku, is_valid_sudoku, VARIABLE_ORDERS, VALUE_ORDERS)
+from csp_A20463413 import CSP
+from dlx_A20463413 import dancing_links
+from instrument_A20463413 import SearchStats, profile_call
+
+# Nothing runs at import time, so the solvers can be imported from here as a library; main() is the command line
+# Usage: cs480_P02_A20463413.py MODE FILE.csv [options]
+# Options after the mode and file name
+# --stats => print the search counters (backtracks, depth, propagation calls, ...) for modes 1, 2, 3, 5 and 6
+# --profile => run the search under cProfile and print where the time went
+# --var=NAME => variable ordering for modes 2, 3, 5 and 6 (first, mrv, mrv+degree or random)
+# --val=NAME => value ordering for modes 2, 3, 5 and 6 (ascending, lcv or random)
+# --seed=N => seed for the random orderings
+
+# Mode number -> name printed in the header
+MODES = {
+    1 : "Brute Force Search",
+    2 : "CSP Back-Tracking Search",
+    3 : "CSP with Forward Checking and MRV Heuristics",
+    4 : "TEST",
+    5 : "CSP with Constraint Propagation and MRV Heuristics",
+    6 : "CSP with Maintaining Arc Consistency (AC-3) and MRV Heuristics",
+    7 : "Dancing Links (Algorithm X) Exact Cover",
+}
+
+# Printed (and the program exits) for any problem with the command line
+USAGE_ERROR = "ERROR: Not enough/too many/illegal input arguments."
+
+
+# argparse parser that exits with USAGE_ERROR instead of printing its own usage message
+class ArgumentParser(argparse.ArgumentParser) :
+    def error(self, message) :
+        sys.exit(USAGE_ERROR)
+
+
+# Parse and check the command line
+# Returns the argparse namespace, with orders holding the keyword arguments for the searches of modes 2, 3, 5 and 6
+# argv => list of arguments (None = sys.argv[1:])
+def parse_args(argv=None) :
+    parser = ArgumentParser(description="Solve a sudoku csv file with one of the search algorithms.", allow_abbrev=False)
+    parser.add_argument("mode", type=int)
+    parser.add_argument("fname")
+    parser.add_argument("--stats", action="store_true")
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--var", dest="var_order", default=None)
+    parser.add_argument("--val", dest="val_order", default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.mode not in MODES or not args.fname.endswith(".csv") :
+        sys.exit(USAGE_ERROR)
+    if args.var_order is not None and args.var_order not in VARIABLE_ORDERS :
+        sys.exit(USAGE_ERROR)
+    if args.val_order is not None and args.val_order not in VALUE_ORDERS :
+        sys.exit(USAGE_ERROR)
+
+    args.orders = {name : getattr(args, name) for name in ["var_order", "val_order", "seed"] if getattr(args, name) is not None}
+    return args
+
+
+# Run search(csp, ...) the way the flags ask for
+# Returns whatever search returns
+# profile => run it under cProfile
+# search => solver function
+# args => arguments for search
+def run_search(profile, search, *args) :
+    if profile :
+        return profile_call(search, *args, out=sys.stdout)
+
+    return search(*args)
+
+
+def main(argv=None) :
+    args = parse_args(argv)
+    mode = args.mode
+    fname = args.fname
+    orders = args.orders
+    modeText = MODES[mode]
 
-if len(sys.argv) != 3 :
-    sys.exit("ERROR: Not enough/too many/illegal input arguments.")
-
-mode = int(sys.argv[1])
-fname = sys.argv[2]
-
-modeText = ""
-if mode == 1 :
-    modeText = "Brute Force Search"
-elif mode == 2 :
-    modeText = "CSP Back-Tracking Search"
-elif mode == 3 :
-    modeText = "CSP with Forward Checking and MRV Heuristics"
-elif mode == 4 :
-    modeText = "TEST"
-else :
-    sys.exit("ERROR: Not enough/too many/illegal input arguments.")
-
-if not fname.endswith(".csv") :
-    sys.exit("ERROR: Not enough/too many/illegal input arguments.")
-
-def main() :
     print("Pietrzyk, Piotr, A20463413 solution:\nInput File: " + fname + "\nAlgorithm: " + modeText + "\n")
     
-    sudoku = []
     # Read the csv file into a 2d array
-    with open(fname, 'r', encoding='utf-8-sig') as csvFile :
-        csvReader = csv.reader(csvFile)
-        for row in csvReader :
-            sudoku.append(row)
+    try :
+        sudoku = csv2sudoku(fname)
+    except ValueError as e :
+        print(fname + ": " + str(e), file=sys.stderr)
+        sys.exit(USAGE_ERROR)
 
-        csvFile.close()
-    
-    # Convert str() numbers into int()
-    for row in range(9) :
-        for col in range(9) :
-            if sudoku[row][col] != "X" :
-                sudoku[row][col] = int(sudoku[row][col])
-    
     # Create a csp object and give it the sudoku board
     # From there it will build a constraint dictionary which maps coordinates in the board to possible values for that coordinate
     # It will also keep a list of which coordinate variables were known initially from reading the file
@@ -52,58 +100,120 @@ def main() :
     print("Input Puzzle: ")
     csp.show_sudoku()
 
+    stats = SearchStats() if args.stats else None
+
     if mode == 1 :
         csp.reset_constraints()
 
         timeStart = timeit.default_timer()
 
-        csp.sudoku, nodes = bruteforce(csp)
+        csp.sudoku, nodes = run_search(args.profile, bruteforce, csp, 0, 0, stats)
 
         timeEnd = timeit.default_timer()
         elapsedTimeInSec = timeEnd - timeStart
 
         if csp.sudoku == -1 :
-            exit("Sudoku has no solution")
+            sys.exit("Sudoku has no solution")
 
         print("Number of search tree nodes generated: " + str(nodes))
         print("Search time: " + str(elapsedTimeInSec) + " seconds")
+        if stats is not None :
+            stats.show()
         print("Solved puzzle: ")
 
         csp.show_sudoku()
     elif mode == 2 :
         timeStart = timeit.default_timer()
 
-        csp.sudoku, nodes = backtracking_search(csp)
+        csp.sudoku, nodes = run_search(args.profile, partial(backtracking_search, **orders), csp, stats)
 
         timeEnd = timeit.default_timer()
         elapsedTimeInSec = timeEnd - timeStart
 
         if csp.sudoku == -1 :
-            exit("Sudoku has no solution")
+            sys.exit("Sudoku has no solution")
 
         print("Number of search tree nodes generated: " + str(nodes))
         print("Search time: " + str(elapsedTimeInSec) + " seconds")
+        if stats is not None :
+            stats.show()
         print("Solved puzzle: ")
 
         csp.show_sudoku()
     elif mode == 3 :
         timeStart = timeit.default_timer()
 
-        csp.sudoku, nodes = backtracking_search_mrv(csp)
+        csp.sudoku, nodes = run_search(args.profile, partial(backtracking_search_mrv, **orders), csp, "fc", stats)
 
         timeEnd = timeit.default_timer()
         elapsedTimeInSec = timeEnd - timeStart
 
         if csp.sudoku == -1 :
-            exit("Sudoku has no solution")
+            sys.exit("Sudoku has no solution")
 
         print("Number of search tree nodes generated: " + str(nodes))
         print("Search time: " + str(elapsedTimeInSec) + " seconds")
+        if stats is not None :
+            stats.show()
         print("Solved puzzle: ")
         
+        csp.show_sudoku()
+    elif mode == 5 :
+        timeStart = timeit.default_timer()
+
+        csp.sudoku, nodes = run_search(args.profile, partial(backtracking_search_mrv, **orders), csp, "propagate", stats)
+
+        timeEnd = timeit.default_timer()
+        elapsedTimeInSec = timeEnd - timeStart
+
+        if csp.sudoku == -1 :
+            sys.exit("Sudoku has no solution")
+
+        print("Number of search tree nodes generated: " + str(nodes))
+        print("Search time: " + str(elapsedTimeInSec) + " seconds")
+        if stats is not None :
+            stats.show()
+        print("Propagation rules used: " + str(csp.rule_counts))
+        print("Solved puzzle: ")
+
+        csp.show_sudoku()
+    elif mode == 6 :
+        timeStart = timeit.default_timer()
+
+        csp.sudoku, nodes = run_search(args.profile, partial(backtracking_search_mac, **orders), csp, stats)
+
+        timeEnd = timeit.default_timer()
+        elapsedTimeInSec = timeEnd - timeStart
+
+        if csp.sudoku == -1 :
+            sys.exit("Sudoku has no solution")
+
+        print("Number of search tree nodes generated: " + str(nodes))
+        print("Search time: " + str(elapsedTimeInSec) + " seconds")
+        if stats is not None :
+            stats.show()
+        print("Values removed by AC-3: " + str(csp.rule_counts["ac3"]))
+        print("Solved puzzle: ")
+
+        csp.show_sudoku()
+    elif mode == 7 :
+        timeStart = timeit.default_timer()
+
+        csp.sudoku, nodes = run_search(args.profile, dancing_links, csp)
+
+        timeEnd = timeit.default_timer()
+        elapsedTimeInSec = timeEnd - timeStart
+
+        if csp.sudoku == -1 :
+            sys.exit("Sudoku has no solution")
+
+        print("Number of search tree nodes generated: " + str(nodes))
+        print("Search time: " + str(elapsedTimeInSec) + " seconds")
+        print("Solved puzzle: ")
+
         csp.show_sudoku()
     elif mode == 4 :
-        if is_valid_sudoku(csp.sudoku) :
+        if is_valid_sudoku(csp.sudoku, csp.geo) :
             print("This is a valid, solved, Sudoku puzzle.")
         else :
             sys.exit("ERROR: This is NOT a solved Sudoku puzzle.")
@@ -1,52 +1,201 @@
+from geometry_A20463413 import get_geometry
+import math
+import propagation_A20463413 as propagation
+
+
 # A class to represent the constraint satisfaction problem
 # sudoku => 2d array which stores the sudoku board
-# domain => [1..9] for each variable (initially)
-# constraints => a dictionary that maps coordinate variables to integers --- { (row, col) : val }
+# geo => shared Geometry object (peers, units, and cell -> unit tables) for the board size
+# domain => [1..size] for each variable (initially), e.g. [1..9] on a 9x9 board
+# domains => list of bitmasks, one per cell, bit (v - 1) is set if v is still a legal value --- domains[row * size + col]
+# values => list of the values placed on the board so far (0 = empty)
+# row_used / col_used / box_used => bitmasks of the values already placed in each row, column, and box
+# unit_counts => how many times each value has been placed in each unit --- unit_counts[unit * size + (v - 1)]
+# unfilled => number of empty cells left
+# free_peers => how many of the peers of each cell are still empty (the degree heuristic) --- free_peers[idx]
+# conflicts => number of placed values that clash with another value in the same row, column, or box
+# trail => undo stack of every change made by assign(), so a search can roll back without copying the CSP
+#          (idx, old_mask) = the domain of idx was changed / (~idx, old_mask) = a value was placed at idx
+# marks => flat index -> length of the trail right before the last update_constraints() assignment there
+# rule_counts => how many changes each propagation rule has made --- { rule : count }
+# consistent => False if the known values already break a rule or leave a variable with no legal values
 # known => list of all coordinate variables initially known
+# propagate => whether to run constraint propagation on the known values when the CSP object is created
+# box => width/height of one box (None = work it out from the number of rows, 3 for a 9x9 board)
 class CSP :
-    def __init__(self, sudoku):
+    def __init__(self, sudoku, propagate=True, box=None):
         self.sudoku = sudoku
-        self.domain = [1,2,3,4,5,6,7,8,9]
-        self.constraints = init_constraints(self.sudoku, self.domain, {})
+        self.geo = get_geometry(board_box(sudoku, box))
+        self.domain = list(range(1, self.geo.size + 1))
+        self.domains = [self.geo.full] * self.geo.cells
+        self.values = [0] * self.geo.cells
+        self.row_used = [0] * self.geo.size
+        self.col_used = [0] * self.geo.size
+        self.box_used = [0] * self.geo.size
+        self.unit_counts = [0] * (len(self.geo.units) * self.geo.size)
+        self.unfilled = self.geo.cells
+        self.free_peers = [len(peers) for peers in self.geo.peers]
+        self.conflicts = 0
+        self.trail = []
+        self.marks = [0] * self.geo.cells
+        self.rule_counts = propagation.new_rule_counts()
+        self.consistent = True
+        init_constraints(self, propagate)
         self.known = init_known(self.sudoku, [])
 
 
+    # The domains as a dictionary that maps coordinate variables to lists of values --- { (row, col) : [vals] }
+    # This is a read-only view that is rebuilt on every access, so it should not be used in the search loops
+    @property
+    def constraints(self) :
+        geo = self.geo
+        return {(geo.row_of[idx], geo.col_of[idx]) : list(geo.mask_values[self.domains[idx]]) for idx in range(geo.cells)}
+
+
+    # Returns the values still left in the domain of var, in ascending order
+    # var => (row, col) index into the sudoku
+    def legal_values(self, var) :
+        return self.geo.mask_values[self.domains[var[0] * self.geo.size + var[1]]]
+
+
+    # Returns the values placed so far as a 2d sudoku board ("X" = empty)
+    def board(self) :
+        size = self.geo.size
+        return [[self.values[row * size + col] or "X" for col in range(size)] for row in range(size)]
+
+
+    # Is every cell filled in? --- O(1)
+    def is_complete(self) :
+        return self.unfilled == 0
+
+
+    # Is every cell filled in without any value clashing with another one? --- O(1)
+    def is_solved(self) :
+        return self.unfilled == 0 and self.conflicts == 0
+
+
+    # Can val be placed at var without clashing with a value already in its row, column, or box? --- O(1)
+    # var => (row, col) index into the sudoku
+    # val => the value to check
+    def is_consistent(self, var, val) :
+        idx = var[0] * self.geo.size + var[1]
+        geo = self.geo
+        return not ((self.row_used[geo.row_of[idx]] | self.col_used[geo.col_of[idx]] | self.box_used[geo.box_of[idx]]) & (1 << (val - 1)))
+
+
     # Given a sudoku board, this function makes sure that all of the initial known values are still in place
-    # This is most useful for the bruteforce() function
-    def compare_known(self, sudoku) :
+    # With no board it checks the values placed in the CSP object itself
+    # sudoku => 2d array sudoku board (None = the values placed in this CSP object)
+    def compare_known(self, sudoku=None) :
+        size = self.geo.size
         for var in self.known :
-            if not ( sudoku[var[0]][var[1]] == self.sudoku[var[0]][var[1]] ) :
+            if sudoku is None :
+                placed = self.values[var[0] * size + var[1]]
+            else :
+                placed = sudoku[var[0]][var[1]]
+            if not ( placed == self.sudoku[var[0]][var[1]] ) :
                 return False
-            
+
         return True
-    
+
+
+    # Returns the current position in the trail, to be passed to undo() later
+    def mark(self) :
+        return len(self.trail)
+
+
+    # Roll back every change recorded in the trail since mark was taken
+    # mark => value returned by mark()
+    def undo(self, mark) :
+        trail = self.trail
+        domains = self.domains
+        while len(trail) > mark :
+            idx, old = trail.pop()
+            if idx < 0 :
+                idx = ~idx
+                unplace(self, idx)
+            domains[idx] = old
+
+
+    # Place val at idx and remove it from the domains of the empty peers, recording every change in the trail
+    # Returns False if a peer is left with an empty domain (the changes are still recorded so undo() cleans them up)
+    # idx => flat index into the board, must be empty
+    # val => the value to place
+    def assign(self, idx, val) :
+        bit = 1 << (val - 1)
+        domains = self.domains
+        values = self.values
+        trail = self.trail
+
+        trail.append((~idx, domains[idx]))
+        place(self, idx, val)
+        domains[idx] = bit
+
+        ok = True
+        for i in self.geo.peers[idx] :
+            d = domains[i]
+            if values[i] == 0 and d & bit : # A value that is already filled can't be removed
+                trail.append((i, d))
+                d &= ~bit
+                domains[i] = d
+                if d == 0 :
+                    ok = False
+
+        return ok
+
+
+    # Place val at idx, recording it in the trail, without touching the domains of any other variable
+    # idx => flat index into the board, must be empty
+    # val => the value to place
+    def set_value(self, idx, val) :
+        self.trail.append((~idx, self.domains[idx]))
+        place(self, idx, val)
+
+
+    # Run the constraint propagation rules (naked/hidden singles, naked/hidden pairs, pointing, box-line reduction)
+    # until nothing else can be inferred, recording every change in the trail
+    # Returns False if a contradiction was found
+    def propagate(self) :
+        return propagation.propagate(self)
+
+
+    # Make every arc between peers consistent with AC-3, recording every change in the trail
+    # Returns False if a variable is left with no legal values
+    # arcs => (xi, xj) flat index pairs to start from (None = every arc on the board)
+    def ac3(self, arcs=None) :
+        return propagation.ac3(self, arcs)
+
 
     # Update constraints (to either remove or add constraints) in the row, column, and box that correlates to var
+    # Both directions go through the trail, so type 1 also rolls back anything assigned after var
     # var => (row, col) index into the sudoku
     # val => the value that should go at the location stored in var
     # type => 0 = add constraints / 1 = remove constraints
     def update_constraints(self, var, val, type) :
+        idx = var[0] * self.geo.size + var[1]
         if type == 0 : # val should be an int here
-            self.constraints[var] = [val]
-            self.constraints = remove_from_row(self.constraints, var)
-            self.constraints = remove_from_col(self.constraints, var)
-            self.constraints = remove_from_box(self.constraints, var)
-        elif type == 1 : # val should be a list here
-            self.constraints[var] = val
-            self.constraints = add2row(self.constraints, var)
-            self.constraints = add2col(self.constraints, var)
-            self.constraints = add2box(self.constraints, var)
+            self.marks[idx] = self.mark()
+            self.assign(idx, val)
+        elif type == 1 : # val should be the old domain here (a list or a bitmask)
+            self.undo(self.marks[idx])
+            if isinstance(val, int) :
+                self.domains[idx] = val
+            else :
+                self.domains[idx] = values2mask(val)
 
 
+    # Go back to only the known values being placed, with every other variable allowed to take any value
     def reset_constraints(self) :
-        c = {}
-        for row in range(9):
-            for col in range(9):
-                if (self.sudoku)[row][col] == "X" :
-                    c[(row, col)] = [1,2,3,4,5,6,7,8,9]
-                else :
-                    c[(row, col)] = [(self.sudoku)[row][col]]
-        self.constraints = c
+        self.trail = []
+        for idx in range(self.geo.cells) :
+            unplace(self, idx)
+        for var in self.known :
+            place(self, var[0] * self.geo.size + var[1], self.sudoku[var[0]][var[1]])
+        for idx in range(self.geo.cells) :
+            if self.values[idx] == 0 :
+                self.domains[idx] = self.geo.full
+            else :
+                self.domains[idx] = 1 << (self.values[idx] - 1)
 
 
     #  X 6 X | 2 X 4 | X 5 X
@@ -62,14 +211,20 @@ class CSP :
     #  X 8 X | 3 X 5 | X 9 X
 
     # Prints out the sudoku board in the format shown above
+    # Bigger boards get the same layout, with every cell padded to the width of the largest value
     def show_sudoku(self) :
-        for row in range(9) :
-            if row == 3 or row == 6 :
-                print("------+-------+------")
-            for col in range(9) :
-                if col == 3 or col == 6 :
+        box = self.geo.box
+        size = self.geo.size
+        width = len(str(size))
+        cell = box * (width + 1)
+        line = "+".join(["-" * cell] + ["-" * (cell + 1)] * (box - 2) + ["-" * cell])
+        for row in range(size) :
+            if row > 0 and row % box == 0 :
+                print(line)
+            for col in range(size) :
+                if col > 0 and col % box == 0 :
                     print("|", end = " ")
-                print(str(self.sudoku[row][col]), end = " ")
+                print(str(self.sudoku[row][col]).rjust(width), end = " ")
             print("")
         print("\n")
 
@@ -82,161 +237,129 @@ class CSP :
 
 # Initializes self.known when a CSP object is created
 def init_known(sudoku, known) :
-    for row in range(9) :
-        for col in range(9) :
+    for row in range(len(sudoku)) :
+        for col in range(len(sudoku[row])) :
             if sudoku[row][col] != "X" :
                 known.append((row, col))
 
     return known
-    
-
-# Initializes self.constraint when a CSP object is created
-def init_constraints(sudoku, domain, constraints):
-        # Initialize the constraints dictionary with [1..9] for each (row, col) variable initially
-        for row in range(9):
-            for col in range(9):
-                constraints[(row, col)] = domain.copy()
-
-        # Update the constraint domain for each variable based on existing filled cells
-        for row in range(9):
-            for col in range(9):
-                if sudoku[row][col] != "X":
-                    constraints[(row, col)] = [sudoku[row][col]]
-                    constraints = remove_from_row(constraints, (row,col))
-                    constraints = remove_from_col(constraints, (row,col))
-                    constraints = remove_from_box(constraints, (row,col))
-
-        return constraints
-
-
-# Remove the value located at var from the constraint lists in its row
-# constraints => constraints dictionary
-# var => (row, col) index
-def remove_from_row(constraints, var):
-    val = constraints[var] # Get the value located at var
-    row = var[0] # Get the row index
-
-    for i in range(9) :
-        if len(constraints[(row, i)]) > 1  : # len(constraints[(row,i)]) = 1 means that value is filled and can't be removed
-            for x in val :
-                # Remove val from the constraint lists
-                if x in constraints[(row, i)] :
-                    c: list = constraints[(row, i)]
-                    c.remove(x)
-                    constraints[(row, i)] = c
-
-    return constraints
-
-
-# Remove the value located at var from the constraint lists in its column
-# constraints => constraints dictionary
-# var => (row, col) index
-def remove_from_col(constraints, var):
-    val = constraints[var] # Get the value located at var
-    col = var[1] # Get the column index
-
-    for i in range(9):
-        if len(constraints[(i, col)]) > 1 : # len(constraints[(row,i)]) = 1 means that value is filled and can't be removed
-            for x in val :
-                # Remove val from the constraint lists
-                if x in constraints[(i, col)] :
-                    c: list = constraints[(i, col)]
-                    c.remove(x)
-                    constraints[(i, col)] = c
-
-    return constraints
-
-
-# Remove the value located at var from the constraint lists in its box
-# constraints => constraints dictionary
-# var => (row, col) index
-def remove_from_box(constraints, var):
-    val = constraints[var] # Get the value located at var
-
-    # The coordinates of the bottom-right of each box
-    boxes = [(2,2), (2,5), (2,8), (5,2), (5,5), (5,8), (8,2), (8,5), (8,8)]
-
-    # Determines which box the given coordinates are located in
-    i = -1
-    for box in boxes :
-        i = i + 1
-        if var[0] <= box[0] and var[1] <= box[1] :
-            break
-
-    # Loops through the values in the box and fix the constraints
-    for row in range(boxes[i][0] - 2, boxes[i][0] + 1) :
-        for col in range(boxes[i][1] - 2, boxes[i][1] + 1) :
-            if len(constraints[(row, col)]) > 1 : # len(constraints[(row,i)]) = 1 means that value is filled and can't be removed
-                for x in val :
-                    # Remove val from the constraint lists
-                    if x in constraints[(row, col)] :
-                        c: list = constraints[(row, col)]
-                        c.remove(x)
-                        constraints[(row, col)] = c
-
-    return constraints
-
-
-# Add the value(s) located at var to the constraint lists in its row
-# constraints => constraints dictionary
-# var => (row, col) index
-def add2row(constraints, var) :
-    val = constraints[var] # Get the value located at var
-    row = var[0] # Get the row index
-
-    for i in range(9) :
-        if len(constraints[(row, i)]) > 1 : # TODO: CHECK TO MAKE SURE THE LOCATION ISN'T VAR INSTEAD
-            for x in val :
-                # Add the value(s) in val to the constraint lists
-                if x not in constraints[(row, i)] :
-                    constraints[(row, i)].append(x)     
-            constraints[(row, i)].sort()
-
-    return constraints
-
-
-# Add the value(s) located at var to the constraint lists in its column
-# constraints => constraints dictionary
-# var => (row, col) index
-def add2col(constraints, var) :
-    val = constraints[var] # Get the value located at var
-    col = var[1] # Get the column index
-
-    for i in range(9) :
-        if len(constraints[(i, col)]) > 1 : # TODO: CHECK TO MAKE SURE THE LOCATION ISN'T VAR INSTEAD
-            for x in val :
-                # Add the value(s) in val to the constraint lists
-                if x not in constraints[(i, col)] :
-                    constraints[(i, col)].append(x)     
-            constraints[(i, col)].sort()
-
-    return constraints
-
-
-# Add the value(s) located at var to the constraint lists in its box
-# constraints => constraints dictionary
-# var => (row, col) index
-def add2box(constraints, var) :
-    val = constraints[var]
-
-    # The coordinates of the bottom-right of each box
-    boxes = [(2,2), (2,5), (2,8), (5,2), (5,5), (5,8), (8,2), (8,5), (8,8)]
-
-    # Determines which box the given coordinates are located in
-    i = -1
-    for box in boxes :
-        i = i + 1
-        if var[0] <= box[0] and var[1] <= box[1] :
-            break
-
-    # Loop through the values in the box and fix the constraints
-    for row in range(boxes[i][0] - 2, boxes[i][0] + 1) :
-        for col in range(boxes[i][1] - 2, boxes[i][1] + 1) :
-            if len(constraints[(row, col)]) > 1 : # TODO: CHECK TO MAKE SURE THE LOCATION ISN'T VAR INSTEAD
-                for x in val :
-                    # Add the value(s) in val to the constraint lists
-                    if x not in constraints[(row, col)] :
-                        constraints[(row, col)].append(x)     
-                constraints[(row, col)].sort()
-
-    return constraints
\ No newline at end of file
+
+
+# Initializes the domains when a CSP object is created
+# Raises ValueError if a known value is not one of 1..size (it would be counted in the wrong unit)
+# csp => CSP object
+# propagate => whether to run constraint propagation once the known values have been placed
+# Work out the box size of a 2d sudoku board (3 for a 9x9 board) and check the board's shape
+# Returns the box size, raises ValueError unless the board has size rows of size cells each, with size = box * box
+# sudoku => 2d array sudoku board
+# box => box size the board should have (None = work it out from the number of rows)
+def board_box(sudoku, box=None) :
+    rows = len(sudoku)
+    if box is None :
+        box = math.isqrt(rows)
+        if box == 0 or rows != box * box :
+            raise ValueError("a board has a square number of rows (4, 9, 16, 25), not " + str(rows))
+    size = box * box
+    if rows != size :
+        raise ValueError("a " + str(size) + "x" + str(size) + " board has " + str(size) + " rows, not " + str(rows))
+    for row in range(size) :
+        if len(sudoku[row]) != size :
+            raise ValueError("row " + str(row) + " has " + str(len(sudoku[row])) + " cells, not " + str(size))
+
+    return box
+
+
+def init_constraints(csp, propagate=True):
+        geo = csp.geo
+
+        # Place every filled cell on the board first so the row/col/box masks are complete
+        for row in range(geo.size):
+            for col in range(geo.size):
+                if csp.sudoku[row][col] != "X":
+                    val = csp.sudoku[row][col]
+                    if type(val) is not int or not 1 <= val <= geo.size:
+                        raise ValueError("value " + str(val) + " at " + str((row, col)) + " is not on a " + str(geo.size) + "x" + str(geo.size) + " board")
+                    idx = row * geo.size + col
+                    place(csp, idx, csp.sudoku[row][col])
+                    csp.domains[idx] = 1 << (csp.sudoku[row][col] - 1)
+
+        # The same value is already known somewhere in a row, column, or box
+        if csp.conflicts > 0:
+            csp.consistent = False
+
+        # Each empty cell can only take the values that are not already used in its row, column, and box
+        for idx in range(geo.cells):
+            if csp.values[idx] == 0:
+                csp.domains[idx] = geo.full & ~(csp.row_used[geo.row_of[idx]] | csp.col_used[geo.col_of[idx]] | csp.box_used[geo.box_of[idx]])
+                if csp.domains[idx] == 0:
+                    csp.consistent = False
+
+        if propagate and csp.consistent:
+            csp.consistent = csp.propagate()
+
+        # Everything up to here is the starting state, so there is nothing for a search to undo
+        csp.trail = []
+
+
+# Convert a list of values into a bitmask
+# vals => list of values
+def values2mask(vals) :
+    mask = 0
+    for v in vals :
+        mask |= 1 << (v - 1)
+
+    return mask
+
+
+# Record that val has been placed at idx
+# Keeps the row/col/box masks, the unit counts, the free peer counts, and the unfilled/conflicts counters up to date
+# csp => CSP object
+# idx => flat index into the board
+def place(csp, idx, val) :
+    geo = csp.geo
+    bit = 1 << (val - 1)
+    counts = csp.unit_counts
+    csp.values[idx] = val
+    csp.unfilled = csp.unfilled - 1
+    freePeers = csp.free_peers
+    for p in geo.peers[idx] :
+        freePeers[p] = freePeers[p] - 1
+    for u in geo.cell_units[idx] :
+        k = u * geo.size + val - 1
+        counts[k] = counts[k] + 1
+        if counts[k] > 1 :
+            csp.conflicts = csp.conflicts + 1
+    csp.row_used[geo.row_of[idx]] |= bit
+    csp.col_used[geo.col_of[idx]] |= bit
+    csp.box_used[geo.box_of[idx]] |= bit
+
+
+# Undo place() for whatever value is located at idx
+# A value only leaves the row/col/box masks once the last copy of it in that unit is gone
+# csp => CSP object
+# idx => flat index into the board
+def unplace(csp, idx) :
+    val = csp.values[idx]
+    if val == 0 :
+        return
+    geo = csp.geo
+    bit = ~(1 << (val - 1))
+    counts = csp.unit_counts
+    csp.values[idx] = 0
+    csp.unfilled = csp.unfilled + 1
+    freePeers = csp.free_peers
+    for p in geo.peers[idx] :
+        freePeers[p] = freePeers[p] + 1
+    size = geo.size
+    row, col, box = geo.cell_units[idx]
+    for u in (row, col, box) :
+        k = u * size + val - 1
+        if counts[k] > 1 :
+            csp.conflicts = csp.conflicts - 1
+        counts[k] = counts[k] - 1
+    if counts[row * size + val - 1] == 0 :
+        csp.row_used[geo.row_of[idx]] &= bit
+    if counts[col * size + val - 1] == 0 :
+        csp.col_used[geo.col_of[idx]] &= bit
+    if counts[box * size + val - 1] == 0 :
+        csp.box_used[geo.box_of[idx]] &= bit
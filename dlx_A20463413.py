@@ -0,0 +1,257 @@
+from csp_A20463413 import CSP
+from search_A20463413 import make_budget
+
+
+# Exact cover problem solved with Knuth's Dancing Links (Algorithm X)
+# The links are stored in flat lists instead of node objects, node 0 is the root and nodes 1..ncols are the column headers
+# L / R => left and right links (the column header list, or the nodes in the same row)
+# U / D => up and down links (the nodes in the same column)
+# C => node -> its column header
+# S => column header -> how many nodes are left in that column
+# row_of => node -> the name of the row it belongs to
+# solution => names of the rows picked so far
+# nodes => how many search nodes were generated
+# budget => Budget object limiting search() (None = no limit)
+class ExactCover :
+    def __init__(self, ncols, budget=None) :
+        self.L = [ncols] + list(range(ncols))
+        self.R = list(range(1, ncols + 1)) + [0]
+        self.U = list(range(ncols + 1))
+        self.D = list(range(ncols + 1))
+        self.C = list(range(ncols + 1))
+        self.S = [0] * (ncols + 1)
+        self.row_of = [None] * (ncols + 1)
+        self.solution = []
+        self.nodes = 0
+        self.budget = budget
+
+
+    # Add a row that covers the given columns
+    # name => returned in the solution if this row gets picked
+    # cols => list of column numbers (0-based)
+    def add_row(self, name, cols) :
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        first = len(L)
+        for i in range(len(cols)) :
+            c = cols[i] + 1
+            node = first + i
+            L.append(node - 1 if i > 0 else first + len(cols) - 1)
+            R.append(node + 1 if i < len(cols) - 1 else first)
+            U.append(U[c])
+            D.append(c)
+            C.append(c)
+            self.row_of.append(name)
+            D[U[c]] = node
+            U[c] = node
+            S[c] = S[c] + 1
+
+
+    # Remove column c from the header list, and every row that uses c from the other columns
+    def cover(self, c) :
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        L[R[c]] = L[c]
+        R[L[c]] = R[c]
+        i = D[c]
+        while i != c :
+            j = R[i]
+            while j != i :
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] = S[C[j]] - 1
+                j = R[j]
+            i = D[i]
+
+
+    # Undo cover(c), in exactly the reverse order
+    def uncover(self, c) :
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[c]
+        while i != c :
+            j = L[i]
+            while j != i :
+                S[C[j]] = S[C[j]] + 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[c]] = c
+        R[L[c]] = c
+
+
+    # Algorithm X, always branching on the column with the fewest rows left
+    # Returns True once every column has been covered, self.solution then holds the names of the rows picked
+    # If the budget runs out it returns TIMEOUT or NODE_LIMIT instead, leaving the links as they are
+    def search(self) :
+        if self.budget is not None :
+            status = self.budget.spend()
+            if status is not None :
+                return status
+        self.nodes = self.nodes + 1
+        L, R, D, C, S = self.L, self.R, self.D, self.C, self.S
+
+        if R[0] == 0 : # Every column is covered
+            return True
+
+        # Choose the column with the fewest rows left
+        c = R[0]
+        best = c
+        while c != 0 :
+            if S[c] < S[best] :
+                best = c
+                if S[c] <= 1 :
+                    break
+            c = R[c]
+
+        if S[best] == 0 : # Some column can't be covered anymore
+            return False
+
+        self.cover(best)
+        r = D[best]
+        while r != best :
+            self.solution.append(self.row_of[r])
+            j = R[r]
+            while j != r :
+                self.cover(C[j])
+                j = R[j]
+
+            found = self.search()
+            if found :
+                return found
+
+            j = L[r]
+            while j != r :
+                self.uncover(C[j])
+                j = L[j]
+            self.solution.pop()
+            r = D[r]
+        self.uncover(best)
+
+        return False
+
+
+    # Algorithm X again, but counting the solutions instead of stopping at the first one
+    # Stops as soon as limit solutions have been found (None = count them all)
+    # Returns the number of solutions found
+    # If the budget runs out it returns TIMEOUT or NODE_LIMIT instead, leaving the links as they are
+    def count(self, limit=None) :
+        if self.budget is not None :
+            status = self.budget.spend()
+            if status is not None :
+                return status
+        self.nodes = self.nodes + 1
+        L, R, D, C, S = self.L, self.R, self.D, self.C, self.S
+
+        if R[0] == 0 : # Every column is covered
+            return 1
+
+        # Choose the column with the fewest rows left
+        c = R[0]
+        best = c
+        while c != 0 :
+            if S[c] < S[best] :
+                best = c
+                if S[c] <= 1 :
+                    break
+            c = R[c]
+
+        if S[best] == 0 : # Some column can't be covered anymore
+            return 0
+
+        total = 0
+        self.cover(best)
+        r = D[best]
+        while r != best :
+            j = R[r]
+            while j != r :
+                self.cover(C[j])
+                j = R[j]
+
+            found = self.count(None if limit is None else limit - total)
+            if type(found) is str : # Out of budget
+                return found
+            total = total + found
+
+            j = L[r]
+            while j != r :
+                self.uncover(C[j])
+                j = L[j]
+
+            if limit is not None and total >= limit :
+                break
+            r = D[r]
+        self.uncover(best)
+
+        return total
+
+
+
+
+
+
+# ---- The functions below are not part of the class ---- #
+
+# Builds the exact cover problem for a sudoku
+# There are 4 groups of columns (324 on a 9x9 board):
+#   cell (row, col) is filled / row has value v / column has value v / box has value v
+# and one row for every value still in the domain of every variable, which covers one column of each group
+# csp => CSP object
+# budget => Budget object limiting the search (None = no limit)
+def sudoku2cover(csp : CSP, budget=None) :
+    geo = csp.geo
+    cells = geo.cells
+    size = geo.size
+
+    cover = ExactCover(4 * cells, budget)
+    for idx in range(cells) :
+        if csp.values[idx] != 0 :
+            vals = (csp.values[idx],)
+        else :
+            vals = geo.mask_values[csp.domains[idx]]
+
+        for v in vals :
+            cover.add_row((idx, v), [idx,
+                                     cells + geo.row_of[idx] * size + v - 1,
+                                     2 * cells + geo.col_of[idx] * size + v - 1,
+                                     3 * cells + geo.box_of[idx] * size + v - 1])
+
+    return cover
+
+
+# Solves the sudoku as an exact cover problem with Dancing Links
+# Returns (solution, nodes) like backtracking_search(), solution is -1 if there is none,
+# or TIMEOUT / NODE_LIMIT if the search ran out of budget
+# csp => CSP object
+# time_limit => seconds the search may take (None = no limit)
+# node_limit => nodes the search may generate (None = no limit)
+def dancing_links(csp : CSP, time_limit=None, node_limit=None) :
+    if not csp.consistent : # The known values already break a rule (or propagation found a contradiction)
+        return -1, 1
+
+    cover = sudoku2cover(csp, make_budget(time_limit, node_limit))
+    found = cover.search()
+    if not found :
+        return -1, cover.nodes
+    if found is not True :
+        return found, cover.nodes
+
+    size = csp.geo.size
+    solution = [["X"] * size for i in range(size)]
+    for idx, v in cover.solution :
+        solution[idx // size][idx % size] = v
+
+    return solution, cover.nodes
+
+
+# Count the solutions of the sudoku with Dancing Links, stopping once limit of them have been found
+# Returns (count, nodes), count is TIMEOUT / NODE_LIMIT if the search ran out of budget
+# csp => CSP object
+# limit => stop counting at this many solutions (None = count them all)
+# time_limit => seconds the search may take (None = no limit)
+# node_limit => nodes the search may generate (None = no limit)
+def dancing_links_count(csp : CSP, limit=2, time_limit=None, node_limit=None) :
+    if not csp.consistent :
+        return 0, 1
+
+    cover = sudoku2cover(csp, make_budget(time_limit, node_limit))
+    count = cover.count(limit)
+    return count, cover.nodes
@@ -0,0 +1,47 @@
+from csp_A20463413 import CSP
+from algorithms_A20463413 import bruteforce, backtracking_search, backtracking_search_mrv, backtracking_search_mac
+from dlx_A20463413 import dancing_links
+from search_A20463413 import make_budget
+
+
+# Brute force search, starting from the raw board like mode 1 of the CLI
+# csp => CSP object
+# time_limit => seconds the search may take (None = no limit)
+# node_limit => nodes the search may generate (None = no limit)
+def bruteforce_search(csp : CSP, time_limit=None, node_limit=None) :
+    csp.reset_constraints()
+    return bruteforce(csp, budget=make_budget(time_limit, node_limit))
+
+
+# Backtracking search with MRV and the full constraint propagation rules after every assignment
+# csp => CSP object
+# time_limit => seconds the search may take (None = no limit)
+# node_limit => nodes the search may generate (None = no limit)
+def propagation_search(csp : CSP, time_limit=None, node_limit=None) :
+    return backtracking_search_mrv(csp, "propagate", time_limit=time_limit, node_limit=node_limit)
+
+
+# Every solver, by name --- { name : function }
+# Each function takes a CSP object (and optionally time_limit= / node_limit= budgets) and returns (solution, nodes),
+# solution is -1 if there is none, or TIMEOUT / NODE_LIMIT if the budget ran out first
+ENGINES = {
+    "bruteforce" : bruteforce_search,
+    "backtrack" : backtracking_search,
+    "mrv" : backtracking_search_mrv,
+    "propagate" : propagation_search,
+    "mac" : backtracking_search_mac,
+    "dlx" : dancing_links,
+}
+
+# The engine used when none is asked for
+DEFAULT_ENGINE = "dlx"
+
+
+# Create a CSP object for the given board and solve it
+# Returns (solution, nodes), solution is -1 if there is none, or TIMEOUT / NODE_LIMIT if the budget ran out first
+# sudoku => 2d array sudoku board
+# engine => name of the solver in ENGINES
+# time_limit => seconds the search may take (None = no limit)
+# node_limit => nodes the search may generate (None = no limit)
+def solve(sudoku, engine=DEFAULT_ENGINE, time_limit=None, node_limit=None) :
+    return ENGINES[engine](CSP(sudoku), time_limit=time_limit, node_limit=node_limit)
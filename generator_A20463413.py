@@ -0,0 +1,205 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from algorithms_A20463413 import backtracking_search_mrv, sudoku2str
+from csp_A20463413 import CSP
+from dlx_A20463413 import dancing_links
+from geometry_A20463413 import get_geometry
+from propagation_A20463413 import RULES
+
+
+# Rules that only fill in singles, a puzzle that needs nothing else is "easy"
+SINGLES = ["naked_single", "hidden_single"]
+
+
+# Fill an empty board with a random complete grid, using the CSP search with random variable and value ordering
+# Returns the 2d board
+# seed => seed for the random orderings
+# box => box size (3 = 9x9)
+def random_grid(seed=None, box=3) :
+    size = box * box
+    csp = CSP([["X"] * size for i in range(size)], propagate=False, box=box)
+    solution, nodes = backtracking_search_mrv(csp, var_order="random", val_order="random", seed=seed)
+    return solution
+
+
+# Is the removed clue forced straight back by a single?
+# Naked single: the peers of idx use every other value, hidden single: some unit of idx has no other empty cell
+# that could hold val
+# This is only the quick test that settles most removals, still_unique() has the complete one
+# values => flat list of the values on the board (0 = empty), with the clue at idx already removed
+# idx => flat index of the removed clue
+# val => value of the removed clue
+# geo => Geometry object for the board size
+def forced(values, idx, val, geo) :
+    peers = geo.peers
+    used = 0
+    for p in peers[idx] :
+        if values[p] :
+            used = used | (1 << (values[p] - 1))
+    if used | (1 << (val - 1)) == geo.full and not used & (1 << (val - 1)) :
+        return True
+
+    for unit in (geo.rows[geo.row_of[idx]], geo.cols[geo.col_of[idx]], geo.boxes[geo.box_of[idx]]) :
+        for other in unit :
+            if other != idx and values[other] == 0 and all(values[p] != val for p in peers[other]) :
+                break
+        else :
+            return True
+
+    return False
+
+
+# Does the puzzle still have exactly one solution once the clue at idx is removed?
+# The puzzle had one solution (with val at idx), so any new solution has to put something else at idx:
+# it stays unique when Dancing Links finds no solution with val taken out of the domain of idx
+# (only the elimination done by CSP() is needed, the search itself does the rest faster than propagation would)
+# If the search runs out of budget first the answer is False, so the clue is kept and the puzzle stays unique
+# puzzle => 2d board with the clue at idx already removed
+# idx => flat index of the removed clue
+# val => value of the removed clue
+# box => box size
+# time_limit => seconds the search may take (None = no limit)
+# node_limit => nodes the search may generate (None = no limit)
+def still_unique(puzzle, idx, val, box=3, time_limit=None, node_limit=None) :
+    csp = CSP(puzzle, propagate=False, box=box)
+    csp.domains[idx] = csp.domains[idx] & ~(1 << (val - 1))
+    if csp.domains[idx] == 0 :
+        return True
+
+    solution, nodes = dancing_links(csp, time_limit, node_limit)
+    return solution == -1
+
+
+# Remove clues from a complete grid in random order, keeping each removal only if the puzzle stays unique,
+# until no more than target clues are left (or no clue can be removed)
+# Returns the 2d puzzle
+# grid => complete 2d board
+# target => clue count to stop at (0 = remove as many as possible)
+# rng => random.Random object
+# box => box size
+# node_limit => nodes each still_unique() check may take before the clue is kept (None = no limit)
+def dig(grid, target=0, rng=random, box=3, node_limit=None) :
+    geo = get_geometry(box)
+    puzzle = [row[:] for row in grid]
+    values = [val for row in grid for val in row]
+    order = list(range(geo.cells))
+    rng.shuffle(order)
+
+    clues = geo.cells
+    for idx in order :
+        if clues <= target :
+            break
+        row, col = geo.coords[idx]
+        val = values[idx]
+        values[idx] = 0
+        puzzle[row][col] = "X"
+        if forced(values, idx, val, geo) or still_unique(puzzle, idx, val, box, node_limit=node_limit) :
+            clues = clues - 1
+        else :
+            values[idx] = val
+            puzzle[row][col] = val
+
+    return puzzle
+
+
+# Estimate how hard a puzzle is from what solving it takes: the propagation rules it needs and the search nodes
+# Returns a dictionary --- clues, nodes, rules (the ones used), grade
+#   grade => "easy" = singles are enough, "medium" = needs pairs / pointing / box-line but no search,
+#            "hard" = needs search on top of the propagation rules
+# puzzle => 2d board
+# box => box size
+def grade(puzzle, box=3) :
+    csp = CSP(puzzle, box=box)
+    clues = len(csp.known)
+    solution, nodes = backtracking_search_mrv(csp, "propagate")
+    rules = [rule for rule in RULES if csp.rule_counts[rule] > 0]
+
+    if nodes > 1 :
+        level = "hard"
+    elif any(rule not in SINGLES for rule in rules) :
+        level = "medium"
+    else :
+        level = "easy"
+
+    return {"clues" : clues, "nodes" : nodes, "rules" : rules, "grade" : level}
+
+
+# Generate one puzzle (runs inside the worker processes)
+# Returns (one line puzzle, grade dictionary)
+# job => (seed, box size, target clue count, node limit of every uniqueness check)
+def generate_one(job) :
+    seed, box, target, node_limit = job
+    rng = random.Random(seed)
+    grid = random_grid(rng.random(), box)
+    puzzle = dig(grid, target, rng, box, node_limit)
+    return sudoku2str(puzzle), grade(puzzle, box)
+
+
+# Generate puzzles across a pool of worker processes
+# Yields (one line puzzle, grade dictionary) in seed order
+# count => number of puzzles
+# box => box size (3 = 9x9)
+# target => clue count to dig down to (0 = as few as possible)
+# workers => number of worker processes (None = one per CPU, 1 = generate in this process)
+# seed => first seed, puzzle i uses seed + i so a run can be repeated
+# node_limit => nodes each uniqueness check may take before its clue is kept (None = no limit), a node budget
+#               instead of a time budget so a run can still be repeated
+def generate(count, box=3, target=0, workers=None, seed=0, node_limit=None) :
+    jobs = [(seed + i, box, target, node_limit) for i in range(count)]
+    if workers is None :
+        workers = os.cpu_count() or 1
+
+    if workers == 1 :
+        for job in jobs :
+            yield generate_one(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool :
+        yield from pool.map(generate_one, jobs, chunksize=max(1, count // (workers * 4)))
+
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Generate random sudoku puzzles with a unique solution, one per line.")
+    parser.add_argument("count", type=int, help="number of puzzles")
+    parser.add_argument("-b", "--box", type=int, default=3, help="box size, 2 = 4x4, 3 = 9x9, 4 = 16x16 (default: %(default)s)")
+    parser.add_argument("-c", "--clues", type=int, default=0, help="clue count to stop digging at (default: as few as possible)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: one per CPU)")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="first seed, puzzle i uses seed + i (default: %(default)s)")
+    parser.add_argument("-n", "--node-limit", type=int, default=None, help="search nodes a uniqueness check may take before its clue is kept (default: no limit)")
+    parser.add_argument("-o", "--output", default=None, help="file to write the puzzles to (default: stdout)")
+    parser.add_argument("-r", "--report", default=None, help="csv file to write the clues, nodes, rules and grade of every puzzle to")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    report = None
+    if args.report :
+        reportFile = open(args.report, 'w', newline='')
+        report = csv.writer(reportFile)
+        report.writerow(["puzzle", "clues", "nodes", "rules", "grade"])
+
+    grades = {}
+    timeStart = timeit.default_timer()
+    try :
+        for line, info in generate(args.count, args.box, args.clues, args.workers, args.seed, args.node_limit) :
+            out.write(line + "\n")
+            grades[info["grade"]] = grades.get(info["grade"], 0) + 1
+            if report is not None :
+                report.writerow([line, info["clues"], info["nodes"], " ".join(info["rules"]), info["grade"]])
+    finally :
+        if args.output :
+            out.close()
+        if report is not None :
+            reportFile.close()
+    elapsedTimeInSec = timeit.default_timer() - timeStart
+
+    print("Puzzles: " + str(args.count) + " " + str(grades), file=sys.stderr)
+    print("Generation time: " + str(elapsedTimeInSec) + " seconds (" + str(args.count / elapsedTimeInSec) + " puzzles/sec)", file=sys.stderr)
+
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,90 @@
+# Precomputed board geometry shared by the CSP class, the validity checks, and the search algorithms
+# Everything here is computed once per box size and then reused, so the hot loops only do list lookups
+#
+# Cells are indexed as a flat list --- idx = row * size + col
+# Values are stored in bitmasks --- bit (v - 1) is set if v is in the mask
+#
+# box => width/height of one box (3 for a normal 9x9 sudoku)
+# size => number of rows, columns, boxes, and values (box * box)
+# cells => number of cells on the board (size * size)
+# full => bitmask with every value in it
+# row_of / col_of / box_of => flat index -> row, column, and box number
+# units => the 3 * size units (all rows, then all columns, then all boxes), each a list of flat indices
+# rows / cols / boxes => the row, column, and box units on their own
+# cell_units => flat index -> (row unit, column unit, box unit) as indices into units
+# peers => flat index -> list of the other cells that share a unit with it (20 on a 9x9 board)
+# box_start => flat index -> (row, col) of the top-left cell of its box
+# coords => flat index -> (row, col)
+# unit_coords => the units again, but as lists of (row, col) coordinates for code that works on 2d boards
+# mask_values => bitmask -> tuple of the values stored in it, in ascending order
+class Geometry :
+    def __init__(self, box) :
+        self.box = box
+        self.size = box * box
+        self.cells = self.size * self.size
+        self.full = (1 << self.size) - 1
+
+        size = self.size
+        self.row_of = [idx // size for idx in range(self.cells)]
+        self.col_of = [idx % size for idx in range(self.cells)]
+        self.box_of = [(self.row_of[idx] // box) * box + self.col_of[idx] // box for idx in range(self.cells)]
+        self.coords = [(self.row_of[idx], self.col_of[idx]) for idx in range(self.cells)]
+        self.box_start = [(self.row_of[idx] - self.row_of[idx] % box, self.col_of[idx] - self.col_of[idx] % box) for idx in range(self.cells)]
+
+        self.rows = [[idx for idx in range(self.cells) if self.row_of[idx] == i] for i in range(size)]
+        self.cols = [[idx for idx in range(self.cells) if self.col_of[idx] == i] for i in range(size)]
+        self.boxes = [[idx for idx in range(self.cells) if self.box_of[idx] == i] for i in range(size)]
+        self.units = self.rows + self.cols + self.boxes
+        self.unit_coords = [[self.coords[idx] for idx in unit] for unit in self.units]
+
+        self.cell_units = [(self.row_of[idx], size + self.col_of[idx], 2 * size + self.box_of[idx]) for idx in range(self.cells)]
+
+        self.peers = []
+        for idx in range(self.cells) :
+            p = set()
+            for u in self.cell_units[idx] :
+                p.update(self.units[u])
+            p.discard(idx)
+            self.peers.append(sorted(p))
+
+        self.mask_values = MaskValues(size)
+
+
+# Maps a bitmask to the tuple of values stored in it
+# 9x9 boards get a full table up front, 16x16 boards fill it in lazily as masks are seen,
+# and anything bigger works it out every time (2^25 possible masks is too many to keep)
+class MaskValues(dict) :
+    def __init__(self, size) :
+        super().__init__()
+        self.size = size
+        self.keep = size <= 16
+        if size <= 9 :
+            for mask in range(1 << size) :
+                self.__missing__(mask)
+
+    def __missing__(self, mask) :
+        vals = []
+        m = mask
+        while m :
+            bit = m & -m
+            vals.append(bit.bit_length())
+            m ^= bit
+        vals = tuple(vals)
+        if self.keep :
+            self[mask] = vals
+        return vals
+
+
+# Cache of Geometry objects --- { box : Geometry }
+_geometries = {}
+
+
+# Returns the (shared) Geometry object for the given box size, building it the first time it is asked for
+# box => width/height of one box (3 for a normal 9x9 sudoku)
+def get_geometry(box=3) :
+    geo = _geometries.get(box)
+    if geo is None :
+        geo = Geometry(box)
+        _geometries[box] = geo
+
+    return geo
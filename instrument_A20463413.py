@@ -0,0 +1,108 @@
+import sys
+import timeit
+
+
+# Counters filled in by the search functions when one is passed to them as stats
+# Nothing here is touched when the searches run without one, so they pay a single "stats is None" check per node
+# nodes => search nodes entered
+# max_depth => deepest node reached (the root is depth 0)
+# solution_depth => depth of the node that completed the board (-1 if none did)
+# propagation_calls => calls to the inference/forward checking after an assignment
+# wipeouts => how many of those calls left some variable with no legal values
+# select_time => seconds spent choosing the next variable
+# propagation_time => seconds spent in inference/forward checking
+class SearchStats :
+    def __init__(self) :
+        self.nodes = 0
+        self.max_depth = 0
+        self.solution_depth = -1
+        self.propagation_calls = 0
+        self.wipeouts = 0
+        self.select_time = 0.0
+        self.propagation_time = 0.0
+
+
+    # Every node that didn't end up on the path to the solution was a dead end the search had to back out of
+    @property
+    def backtracks(self) :
+        return self.nodes - (self.solution_depth + 1)
+
+
+    # Called once at the start of every search node
+    # depth => depth of the node
+    def enter(self, depth) :
+        self.nodes = self.nodes + 1
+        if depth > self.max_depth :
+            self.max_depth = depth
+
+
+    # Call fn(*args) to choose the next variable, timing it
+    # Returns whatever fn returns
+    def select(self, fn, *args) :
+        timeStart = timeit.default_timer()
+        result = fn(*args)
+        self.select_time = self.select_time + timeit.default_timer() - timeStart
+        return result
+
+
+    # Call fn(*args) to do inference after an assignment, timing it and counting wipeouts (fn returns False)
+    # Returns whatever fn returns
+    def propagate(self, fn, *args) :
+        timeStart = timeit.default_timer()
+        result = fn(*args)
+        self.propagation_time = self.propagation_time + timeit.default_timer() - timeStart
+        self.propagation_calls = self.propagation_calls + 1
+        if result is False :
+            self.wipeouts = self.wipeouts + 1
+        return result
+
+
+    # Returns the counters as a dictionary
+    def as_dict(self) :
+        return {
+            "nodes" : self.nodes,
+            "backtracks" : self.backtracks,
+            "max_depth" : self.max_depth,
+            "propagation_calls" : self.propagation_calls,
+            "wipeouts" : self.wipeouts,
+            "select_time" : self.select_time,
+            "propagation_time" : self.propagation_time,
+        }
+
+
+    # Print the counters
+    # out => file to print to
+    def show(self, out=sys.stdout) :
+        print("Backtracks: " + str(self.backtracks), file=out)
+        print("Max search depth: " + str(self.max_depth), file=out)
+        print("Propagation calls: " + str(self.propagation_calls) + " (" + str(self.wipeouts) + " wipeouts)", file=out)
+        print("Variable selection time: " + str(self.select_time) + " seconds", file=out)
+        print("Propagation time: " + str(self.propagation_time) + " seconds", file=out)
+
+
+
+
+
+# ---- The functions below are not part of the class ---- #
+
+# Run fn(*args) under cProfile and print the most expensive functions
+# Returns whatever fn returns
+# fn => function to profile
+# args => arguments for fn
+# out => file to print the profile to
+# sort => pstats sort key
+# limit => number of functions to print
+def profile_call(fn, *args, out=sys.stderr, sort="cumulative", limit=25) :
+    # Imported here, pstats alone takes longer to import than the rest of the solver
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args)
+
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats(sort).print_stats(limit)
+    print(report.getvalue(), file=out)
+
+    return result
@@ -0,0 +1,453 @@
+import argparse
+import csv
+import math
+import mmap
+import os
+import struct
+import sys
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from algorithms_A20463413 import csv2sudoku, line2sudoku, sudoku2str
+import vector_A20463413 as vector
+from batch_A20463413 import read_puzzles, solve_timed, solve_batch_vectorized, summarize, show_summary
+from engines_A20463413 import ENGINES, DEFAULT_ENGINE
+from search_A20463413 import TIMEOUT, NODE_LIMIT
+
+
+# Packed corpus file
+#   header => magic, version, box size, flags, (unused byte), number of records, record size --- HEADER below
+#   records => one fixed-size record per puzzle right after the header, so record i starts at HEADER.size + i * record size
+# Every record holds
+#   puzzle => the cells in row order, 4 bits each (two cells per byte, high nibble first) for boards up to 9x9
+#             and one byte each for bigger boards, 0 = empty
+#   status + solution => only if flags has SOLUTIONS, one status byte (STATUS_CODES) then the solved board packed
+#                        the same way as the puzzle (all zeros unless the status is "solved")
+#   stats => only if flags has STATS, search nodes (uint64) and seconds (float64)
+# A 9x9 puzzle takes 41 bytes, 99 with a solution and stats (the csv files take about 170 bytes)
+MAGIC = b"SDKP"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBxQI")
+STATS = struct.Struct("<Qd")
+
+# Header flags
+SOLUTIONS = 1
+STATS_FLAG = 2
+
+# What the status byte of a record means --- 0 = not solved yet
+SOLVED = 1
+STATUS_CODES = {None : 0, "solved" : SOLVED, -1 : 2, TIMEOUT : 3, NODE_LIMIT : 4}
+CODE_STATUSES = {code : status for status, code in STATUS_CODES.items()}
+
+# Lookup table for unpack_cells() --- byte -> (high nibble, low nibble)
+NIBBLES = [(b >> 4, b & 15) for b in range(256)]
+
+
+# Bits used for one cell on a board with the given box size
+def cell_bits(box) :
+    return 4 if box * box < 16 else 8
+
+
+# Bytes used by one packed board
+# box => box size
+def board_bytes(box) :
+    cells = box ** 4
+    return (cells + 1) // 2 if cell_bits(box) == 4 else cells
+
+
+# Pack the cells of a board
+# Returns bytes
+# values => flat list of the values (0 = empty)
+# bits => cell_bits() for the board size
+def pack_cells(values, bits) :
+    if bits == 8 :
+        return bytes(values)
+    if len(values) % 2 :
+        values = values + [0]
+    return bytes([(values[i] << 4) | values[i + 1] for i in range(0, len(values), 2)])
+
+
+# Unpack the cells of a board
+# Returns the flat list of the values (0 = empty)
+# data => bytes-like object holding the packed board
+# cells => number of cells on the board
+# bits => cell_bits() for the board size
+def unpack_cells(data, cells, bits) :
+    if bits == 8 :
+        return list(data[:cells])
+    values = [v for b in data[:(cells + 1) // 2] for v in NIBBLES[b]]
+    return values[:cells]
+
+
+# Flat list of the values of a 2d board (0 = empty)
+def board2values(sudoku) :
+    return [x if type(x) is int else 0 for row in sudoku for x in row]
+
+
+# 2d board ("X" for empty cells) from a flat list of values
+# values => flat list of the values (0 = empty)
+# size => rows on the board
+def values2board(values, size) :
+    return [[x or "X" for x in values[i : i + size]] for i in range(0, size * size, size)]
+
+
+# Writes a packed corpus file one record at a time, the record count in the header is filled in by close()
+# f => the open file
+# box => box size of every board in the file
+# flags => SOLUTIONS and / or STATS_FLAG, which optional fields every record has
+# count => records written so far
+class PackedWriter :
+    def __init__(self, path, box=3, solutions=False, stats=False) :
+        self.box = box
+        self.size = box * box
+        self.bits = cell_bits(box)
+        self.boardBytes = board_bytes(box)
+        self.flags = (SOLUTIONS if solutions else 0) | (STATS_FLAG if stats else 0)
+        self.recordSize = record_size(box, self.flags)
+        self.count = 0
+        self.f = open(path, 'wb')
+        self.f.write(HEADER.pack(MAGIC, VERSION, box, self.flags, 0, self.recordSize))
+
+
+    # Append one record
+    # sudoku => 2d array sudoku board, or the packed puzzle bytes (a record view from PackedReader.view() works)
+    # solution => solved 2d board or one line string, -1 (no solution), TIMEOUT / NODE_LIMIT, or None (not solved)
+    # nodes / seconds => search statistics, only stored if the file has STATS_FLAG
+    def write(self, sudoku, solution=None, nodes=0, seconds=0.0) :
+        if isinstance(sudoku, list) :
+            self.f.write(pack_cells(board2values(sudoku), self.bits))
+        else :
+            self.f.write(sudoku[:self.boardBytes])
+
+        if self.flags & SOLUTIONS :
+            if isinstance(solution, str) and solution not in STATUS_CODES :
+                solution = line2sudoku(solution)
+            if isinstance(solution, list) :
+                self.f.write(bytes([SOLVED]) + pack_cells(board2values(solution), self.bits))
+            else :
+                self.f.write(bytes([STATUS_CODES[solution]]) + bytes(self.boardBytes))
+        if self.flags & STATS_FLAG :
+            self.f.write(STATS.pack(nodes, seconds))
+        self.count = self.count + 1
+
+
+    # Fill in the record count and close the file
+    def close(self) :
+        if self.f is None :
+            return
+        self.f.seek(0)
+        self.f.write(HEADER.pack(MAGIC, VERSION, self.box, self.flags, self.count, self.recordSize))
+        self.f.close()
+        self.f = None
+
+
+# Reads a packed corpus file through mmap, so any record can be read without reading the ones before it
+# and slices of the records can be handed around without copying them
+# Indexing returns the puzzle as a 2d board (a list of them for a slice)
+# box / flags / recordSize => from the header
+# count => number of records
+# data => memoryview of the records
+class PackedReader :
+    def __init__(self, path) :
+        self.f = open(path, 'rb')
+        try :
+            self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError : # An empty file
+            self.f.close()
+            raise ValueError(path + " is not a packed corpus file")
+        if len(self.mm) < HEADER.size :
+            self.close()
+            raise ValueError(path + " is not a packed corpus file")
+        magic, version, box, flags, count, recordSize = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION :
+            self.close()
+            raise ValueError(path + " is not a packed corpus file")
+        # The header is trusted for every read after this, so it has to agree with itself and with the file
+        if not 2 <= box <= 15 or flags & ~(SOLUTIONS | STATS_FLAG) or recordSize != record_size(box, flags) :
+            self.close()
+            raise ValueError(path + " has a bad header (box size " + str(box) + ", flags " + str(flags) + ", record size " + str(recordSize) + ")")
+        room = (len(self.mm) - HEADER.size) // recordSize
+        if count > room :
+            self.close()
+            raise ValueError(path + " is cut short: the header says " + str(count) + " records of " + str(recordSize) + " bytes, the file only has room for " + str(room))
+
+        self.box = box
+        self.size = box * box
+        self.cells = self.size * self.size
+        self.bits = cell_bits(box)
+        self.boardBytes = board_bytes(box)
+        self.flags = flags
+        self.count = count
+        self.recordSize = recordSize
+        self.data = memoryview(self.mm)[HEADER.size : HEADER.size + count * recordSize]
+
+
+    def __len__(self) :
+        return self.count
+
+
+    def __getitem__(self, i) :
+        if isinstance(i, slice) :
+            return [self.puzzle(j) for j in range(*i.indices(self.count))]
+        return self.puzzle(i)
+
+
+    # Records start to stop as one memoryview into the file (no copy)
+    def view(self, start=0, stop=None) :
+        stop = self.count if stop is None else min(stop, self.count)
+        return self.data[start * self.recordSize : stop * self.recordSize]
+
+
+    # Record i as a memoryview into the file (no copy)
+    def record(self, i) :
+        if i < 0 :
+            i = i + self.count
+        if not 0 <= i < self.count :
+            raise IndexError("record " + str(i) + " out of range")
+        return self.data[i * self.recordSize : (i + 1) * self.recordSize]
+
+
+    # Returns puzzle i as a 2d board
+    def puzzle(self, i) :
+        return values2board(unpack_cells(self.record(i), self.cells, self.bits), self.size)
+
+
+    # Returns the solution stored for puzzle i --- the solved 2d board, -1, TIMEOUT / NODE_LIMIT, or None if
+    # it wasn't solved (or the file has no solutions)
+    def solution(self, i) :
+        if not self.flags & SOLUTIONS :
+            return None
+        record = self.record(i)
+        status = CODE_STATUSES[record[self.boardBytes]]
+        if status != "solved" :
+            return status
+        return values2board(unpack_cells(record[self.boardBytes + 1 :], self.cells, self.bits), self.size)
+
+
+    # Returns (nodes, seconds) stored for puzzle i, or None if the file has no stats
+    def stats(self, i) :
+        if not self.flags & STATS_FLAG :
+            return None
+        return STATS.unpack_from(self.record(i), self.recordSize - STATS.size)
+
+
+    # The memoryviews have to be released before the map can be closed
+    def close(self) :
+        if getattr(self, "data", None) is not None :
+            self.data.release()
+            self.data = None
+        self.mm.close()
+        self.f.close()
+
+
+
+
+
+# ---- The functions below are not part of the class ---- #
+
+# Bytes in one record
+# box => box size
+# flags => header flags
+def record_size(box, flags) :
+    size = board_bytes(box)
+    if flags & SOLUTIONS :
+        size = size + 1 + board_bytes(box)
+    if flags & STATS_FLAG :
+        size = size + STATS.size
+    return size
+
+
+# Is the file a packed corpus file?
+def is_packed(path) :
+    if not os.path.isfile(path) :
+        return False
+    with open(path, 'rb') as f :
+        return f.read(len(MAGIC)) == MAGIC
+
+
+# Write boards to a new packed corpus file
+# Returns the number of records written
+# path => file to write
+# sudokus => list of 2d array sudoku boards (all the same size)
+# results => list of (solution, nodes, seconds) like solve_timed() returns, one per puzzle (None = puzzles only)
+def write_packed(path, sudokus, results=None) :
+    box = math.isqrt(len(sudokus[0])) if sudokus else 3
+    writer = PackedWriter(path, box, solutions=results is not None, stats=results is not None)
+    try :
+        for i in range(len(sudokus)) :
+            if results is None :
+                writer.write(sudokus[i])
+            else :
+                writer.write(sudokus[i], *results[i])
+    finally :
+        writer.close()
+
+    return writer.count
+
+
+# Set in every worker process by solve_range() --- { path : PackedReader }, so a worker maps each file only once
+_readers = {}
+
+
+# Solve records start to stop of a packed file (runs inside the worker processes)
+# The worker maps the file itself, so the puzzles never have to be pickled and sent to it
+# Returns a list of solve_timed() results
+# job => (path, start, stop, engine name, time limit, node limit)
+def solve_range(job) :
+    path, start, stop, engine, time_limit, node_limit = job
+    if path not in _readers :
+        _readers[path] = PackedReader(path)
+    reader = _readers[path]
+
+    return [solve_timed((reader.puzzle(i), engine, time_limit, node_limit)) for i in range(start, stop)]
+
+
+# The puzzles of records start to stop as a (puzzles, cells) uint8 array of values (0 = empty), the input of
+# vector_A20463413.propagate_all()
+# The records are read straight out of the map (np.frombuffer over view()), the only copy made is the writable
+# array itself, 4 bit cells are split out of their bytes with numpy instead of one cell at a time
+# Needs numpy
+# reader => PackedReader object
+# start / stop => range of records (stop = None for the rest of the file)
+def values_array(reader : PackedReader, start=0, stop=None) :
+    if not vector.available() :
+        raise ImportError("values_array() needs numpy")
+    np = vector.np
+
+    records = np.frombuffer(reader.view(start, stop), dtype=np.uint8).reshape(-1, reader.recordSize)
+    boards = records[:, :reader.boardBytes]
+    if reader.bits == 8 :
+        return boards.copy()
+
+    values = np.empty((len(boards), reader.boardBytes * 2), dtype=np.uint8)
+    values[:, 0::2] = boards >> 4
+    values[:, 1::2] = boards & 0x0F
+    return values[:, :reader.cells].copy() if reader.cells % 2 else values
+
+
+# Solve every puzzle of a packed corpus file across a pool of worker processes, each worker reading its own
+# ranges of records straight from the map
+# Returns (results, seconds) like batch_A20463413.solve_batch()
+# path => packed corpus file
+# vectorized => propagate every puzzle at once with numpy first (values_array() then
+#               batch_A20463413.solve_batch_vectorized()), only the puzzles left over go to the pool
+# the other arguments are the same as solve_batch()
+def solve_packed(path, engine=DEFAULT_ENGINE, workers=None, chunksize=None, time_limit=None, node_limit=None, vectorized=False) :
+    reader = PackedReader(path)
+    count = len(reader)
+    if vectorized :
+        try :
+            values = values_array(reader)
+        finally :
+            reader.close()
+        return solve_batch_vectorized(values, engine, workers, chunksize, time_limit, node_limit)
+    reader.close()
+    if workers is None :
+        workers = os.cpu_count() or 1
+    if chunksize is None :
+        chunksize = max(1, min(1000, count // (workers * 4)))
+    jobs = [(path, start, min(start + chunksize, count), engine, time_limit, node_limit) for start in range(0, count, chunksize)]
+
+    timeStart = timeit.default_timer()
+    if workers == 1 :
+        chunks = [solve_range(job) for job in jobs]
+    else :
+        with ProcessPoolExecutor(max_workers=workers) as pool :
+            chunks = list(pool.map(solve_range, jobs))
+    elapsedTimeInSec = timeit.default_timer() - timeStart
+
+    return [result for chunk in chunks for result in chunk], elapsedTimeInSec
+
+
+# Write the puzzles (or their solutions) of a packed corpus file as one line puzzles, or as csv files
+# Returns the number of puzzles written
+# reader => PackedReader object
+# output => line file to write, or a directory for one csv file per puzzle (0.csv, 1.csv, ...)
+# solutions => write the stored solutions instead of the puzzles ("no solution" / the status for unsolved ones)
+def unpack(reader : PackedReader, output, solutions=False) :
+    boards = (reader.solution(i) if solutions else reader.puzzle(i) for i in range(len(reader)))
+    if os.path.isdir(output) :
+        for i, board in enumerate(boards) :
+            with open(os.path.join(output, str(i) + ".csv"), 'w', newline='') as csvFile :
+                csv.writer(csvFile).writerows(board if isinstance(board, list) else [])
+        return len(reader)
+
+    with open(output, 'w') as out :
+        for board in boards :
+            if isinstance(board, list) :
+                out.write(sudoku2str(board) + "\n")
+            else :
+                out.write(("no solution" if board == -1 else str(board)) + "\n")
+
+    return len(reader)
+
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Convert sudoku corpora to and from the packed binary format, and solve packed corpora.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pack = commands.add_parser("pack", help="pack a line file, a csv file or a directory of csv files")
+    pack.add_argument("input", help="file with one puzzle per line, a csv file, or a directory of csv files")
+    pack.add_argument("output", help="packed file to write")
+
+    unpackCmd = commands.add_parser("unpack", help="write the puzzles of a packed file as lines or csv files")
+    unpackCmd.add_argument("input", help="packed file")
+    unpackCmd.add_argument("output", help="line file to write, or an existing directory for one csv file per puzzle")
+    unpackCmd.add_argument("-s", "--solutions", action="store_true", help="write the stored solutions instead of the puzzles")
+
+    solveCmd = commands.add_parser("solve", help="solve every puzzle of a packed file across a pool of worker processes")
+    solveCmd.add_argument("input", help="packed file")
+    solveCmd.add_argument("-o", "--output", default=None, help="packed file to write the puzzles with their solutions and stats to (default: one line solutions on stdout)")
+    solveCmd.add_argument("-e", "--engine", choices=sorted(ENGINES), default=DEFAULT_ENGINE, help="solver to use (default: %(default)s)")
+    solveCmd.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: one per CPU)")
+    solveCmd.add_argument("-c", "--chunksize", type=int, default=None, help="records a worker reads and solves at once")
+    solveCmd.add_argument("-t", "--time-limit", type=float, default=None, help="seconds each puzzle may take (default: no limit)")
+    solveCmd.add_argument("-n", "--node-limit", type=int, default=None, help="search nodes each puzzle may generate (default: no limit)")
+    solveCmd.add_argument("--vectorized", action="store_true", help="propagate every puzzle at once with numpy first, searching only the ones left over")
+    args = parser.parse_args(argv)
+
+    if args.command == "pack" :
+        if os.path.isfile(args.input) and args.input.endswith(".csv") :
+            puzzles = [(args.input, csv2sudoku(args.input))]
+        else :
+            puzzles = read_puzzles(args.input)
+        count = write_packed(args.output, [p[1] for p in puzzles])
+        print("Packed " + str(count) + " puzzles into " + str(os.path.getsize(args.output)) + " bytes", file=sys.stderr)
+        return
+
+    if not is_packed(args.input) :
+        parser.error(args.input + " is not a packed corpus file")
+
+    try :
+        reader = PackedReader(args.input)
+    except ValueError as e :
+        parser.error(str(e))
+    if args.command == "unpack" :
+        try :
+            count = unpack(reader, args.output, args.solutions)
+        finally :
+            reader.close()
+        print("Unpacked " + str(count) + " puzzles", file=sys.stderr)
+        return
+
+    reader.close()
+    if args.vectorized and not vector.available() :
+        parser.error("--vectorized needs numpy")
+    results, elapsedTimeInSec = solve_packed(args.input, args.engine, args.workers, args.chunksize, args.time_limit, args.node_limit, args.vectorized)
+    if args.output :
+        reader = PackedReader(args.input)
+        writer = PackedWriter(args.output, reader.box, solutions=True, stats=True)
+        try :
+            for i in range(len(reader)) :
+                writer.write(reader.record(i), *results[i])
+        finally :
+            writer.close()
+            reader.close()
+    else :
+        for result in results :
+            sys.stdout.write(("no solution" if result[0] == -1 else result[0]) + "\n")
+
+    show_summary(summarize(results, elapsedTimeInSec))
+
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,176 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import timeit
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+from algorithms_A20463413 import backtrack, backtrack_mrv, csv2sudoku, line2sudoku
+from csp_A20463413 import CSP
+from engines_A20463413 import solve
+from search_A20463413 import TIMEOUT
+
+
+# The searches that can be split, by engine name --- { name : function (csp) -> Search object }
+SEARCHES = {
+    "backtrack" : backtrack,
+    "mrv" : partial(backtrack_mrv, inference_type="fc"),
+    "propagate" : partial(backtrack_mrv, inference_type="propagate"),
+    "mac" : partial(backtrack_mrv, inference_type="mac"),
+}
+
+# Nodes a worker searches between checks for cancellation
+SLICE = 2000
+
+# Set in every worker process by init_worker() --- multiprocessing.Event that is set once some part is solved
+_stop = None
+
+
+# Prepare the search for one puzzle (or part of one)
+# Returns a Search object, or None if the puzzle has no solution
+# board => 2d array sudoku board
+# engine => name in SEARCHES
+def make_search(board, engine) :
+    csp = CSP(board)
+    if not csp.consistent :
+        return None
+    if engine == "mac" and not csp.ac3() : # MAC starts from an arc consistent problem
+        return None
+
+    return SEARCHES[engine](csp)
+
+
+# Split the top of the search tree into independent parts
+# Variables are picked and values are applied exactly the way the search itself would, one whole level at a time,
+# until there are at least parts subproblems (or the tree runs out)
+# Returns (solution, parts, nodes), solution is the solved board if the splitting already found one (else None),
+# parts is a list of 2d boards each with the values of one branch filled in
+# sudoku => 2d array sudoku board
+# engine => name in SEARCHES
+# parts => how many parts to aim for
+def split(sudoku, engine, parts) :
+    frontier = [sudoku]
+    nodes = 0
+    while frontier and len(frontier) < parts :
+        level = []
+        for board in frontier :
+            nodes = nodes + 1
+            search = make_search(board, engine)
+            if search is None :
+                continue
+
+            csp = search.csp
+            idx = search.select(csp, 0)
+            if idx == -1 : # Is assignment complete?
+                return csp.board(), [], nodes
+
+            var = csp.geo.coords[idx]
+            for val in csp.legal_values(var) :
+                mark = csp.mark()
+                if search.apply(csp, var, val) :
+                    level.append(csp.board())
+                csp.undo(mark)
+        frontier = level
+
+    return None, frontier, nodes
+
+
+# Runs in every worker process when it starts
+# stop => multiprocessing.Event shared by the workers
+def init_worker(stop) :
+    global _stop
+    _stop = stop
+
+
+# Search one part (runs inside the worker processes), giving up as soon as another part has been solved
+# Returns (solution, nodes), solution is the solved board, -1 if this part has no solution, or None if it was cancelled
+# job => (2d board, engine name)
+def solve_part(job) :
+    board, engine = job
+    search = make_search(board, engine)
+    if search is None :
+        return -1, 1
+
+    while search.run(node_limit=SLICE) == "paused" :
+        if _stop.is_set() :
+            return None, search.nodes
+
+    return search.solution, search.nodes
+
+
+# Solve one hard puzzle on a pool of worker processes by splitting the top levels of its search tree
+# The first part to find a solution wins and every other worker is told to stop
+# Returns (solution, nodes) like engines_A20463413.solve(), nodes adds up the splitting and every part that ran
+# sudoku => 2d array sudoku board
+# engine => name in SEARCHES
+# workers => number of worker processes (None = one per CPU)
+# parts => how many parts to split the puzzle into (None = 8 per worker)
+# time_limit => seconds the whole search may take (None = no limit)
+def solve_parallel(sudoku, engine="backtrack", workers=None, parts=None, time_limit=None) :
+    if workers is None :
+        workers = os.cpu_count() or 1
+    if parts is None :
+        parts = 8 * workers
+    deadline = None if time_limit is None else timeit.default_timer() + time_limit
+
+    solution, boards, nodes = split(sudoku, engine, parts)
+    if solution is not None :
+        return solution, nodes
+    if not boards :
+        return -1, nodes
+
+    stop = multiprocessing.Event()
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(stop,))
+    try :
+        pending = {pool.submit(solve_part, (board, engine)) for board in boards}
+        solution = -1
+        while pending :
+            timeout = None if deadline is None else max(0.0, deadline - timeit.default_timer())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done : # Out of time
+                solution = TIMEOUT
+                break
+            for future in done :
+                result, n = future.result()
+                nodes = nodes + n
+                if result is not None and result != -1 :
+                    solution = result
+            if solution != -1 :
+                break
+    finally :
+        stop.set() # Tell the parts still running to stop
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return solution, nodes
+
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Solve one hard sudoku on a process pool by splitting its search tree, and report the speedup over one core.")
+    parser.add_argument("input", help="csv file, or a one line puzzle")
+    parser.add_argument("-e", "--engine", choices=sorted(SEARCHES), default="backtrack", help="search to split (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: one per CPU)")
+    parser.add_argument("-p", "--parts", type=int, default=None, help="parts to split the puzzle into (default: 8 per worker)")
+    parser.add_argument("-t", "--time-limit", type=float, default=None, help="seconds each solver may take (default: no limit)")
+    args = parser.parse_args(argv)
+
+    sudoku = csv2sudoku(args.input) if args.input.endswith(".csv") else line2sudoku(args.input)
+
+    timeStart = timeit.default_timer()
+    solution, nodes = solve(sudoku, args.engine, args.time_limit)
+    serialTime = timeit.default_timer() - timeStart
+    print("Single core: " + str(nodes) + " nodes, " + str(serialTime) + " seconds")
+
+    timeStart = timeit.default_timer()
+    solution, nodes = solve_parallel(sudoku, args.engine, args.workers, args.parts, args.time_limit)
+    parallelTime = timeit.default_timer() - timeStart
+    print("Parallel: " + str(nodes) + " nodes, " + str(parallelTime) + " seconds")
+    print("Speedup: " + str(serialTime / parallelTime))
+
+    if solution == -1 :
+        sys.exit("Sudoku has no solution")
+    if solution == TIMEOUT :
+        sys.exit("Sudoku was not solved in time")
+
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,235 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import queue
+import sys
+import timeit
+from algorithms_A20463413 import csv2sudoku, line2sudoku, sudoku2str
+from batch_A20463413 import read_puzzles
+from csp_A20463413 import CSP
+from engines_A20463413 import ENGINES, solve
+from search_A20463413 import TIMEOUT, STATUSES
+
+
+# Engines raced when none are asked for
+DEFAULT_PORTFOLIO = ["backtrack", "mrv", "propagate", "mac", "dlx"]
+
+# Extra seconds a race gets on top of its time limit before the engines still running are killed
+# (every engine is given the time limit as its own budget, so they normally give up first)
+GRACE = 0.5
+
+# Seconds race() waits for an answer before checking that the engines still in the race are alive
+POLL = 0.1
+
+# Returned by race() in place of the solution when every engine failed (raised, or died without answering),
+# so a crash isn't reported as running out of budget
+ERROR = "error"
+
+# Puzzle features logged with every race, in the order they are written to the log
+# clues => known values, empty => cells left to fill
+# domain_total / domain_mean / domain_min / domain_max => sizes of the domains of the empty cells once the known
+#                                                         values have been eliminated (CSP() without propagation)
+# bivalue => empty cells with exactly two legal values
+FEATURES = ["clues", "empty", "domain_total", "domain_mean", "domain_min", "domain_max", "bivalue"]
+
+# Columns of the race log
+LOG_FIELDS = ["puzzle"] + FEATURES + ["winner", "seconds", "nodes"]
+
+
+# Features of a puzzle for choosing an engine
+# Returns { feature : value } for every name in FEATURES
+# sudoku => 2d array sudoku board
+def puzzle_features(sudoku) :
+    csp = CSP(sudoku, propagate=False)
+    sizes = [len(csp.geo.mask_values[csp.domains[idx]]) for idx in range(csp.geo.cells) if csp.values[idx] == 0]
+    return {
+        "clues" : len(csp.known),
+        "empty" : len(sizes),
+        "domain_total" : sum(sizes),
+        "domain_mean" : sum(sizes) / len(sizes) if sizes else 0.0,
+        "domain_min" : min(sizes, default=0),
+        "domain_max" : max(sizes, default=0),
+        "bivalue" : sizes.count(2),
+    }
+
+
+# Solve the puzzle with one engine and report back (runs in its own process)
+# engine => name of the solver in ENGINES
+# sudoku => 2d array sudoku board
+# time_limit / node_limit => budget for the engine (None = no limit)
+# results => multiprocessing.Queue the (engine, solution, nodes, seconds) tuple is put on, solution is None
+#            if the engine failed
+def race_worker(engine, sudoku, time_limit, node_limit, results) :
+    timeStart = timeit.default_timer()
+    try :
+        solution, nodes = solve(sudoku, engine, time_limit, node_limit)
+    except Exception : # Drop out of the race instead of leaving it waiting for this engine
+        solution, nodes = None, 0
+    results.put((engine, solution, nodes, timeit.default_timer() - timeStart))
+
+
+# Race several engines on one puzzle, each in its own process
+# The first engine to answer (a solution, or -1 for no solution) wins and the others are killed,
+# an engine that runs out of budget, raises or dies drops out of the race
+# Returns (solution, nodes, winner, seconds) --- solution like engines_A20463413.solve(), nodes and seconds are the
+# winner's, winner is None if no engine answered: solution is then TIMEOUT / NODE_LIMIT if an engine ran out of
+# budget (or the race ran out of time), or ERROR if every engine failed
+# sudoku => 2d array sudoku board
+# engines => list of names of solvers in ENGINES
+# time_limit => seconds the race may take (None = no limit)
+# node_limit => nodes each engine may generate (None = no limit)
+def race(sudoku, engines=DEFAULT_PORTFOLIO, time_limit=None, node_limit=None) :
+    timeStart = timeit.default_timer()
+    deadline = None if time_limit is None else timeStart + time_limit + GRACE
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=race_worker, args=(engine, sudoku, time_limit, node_limit, results), daemon=True)
+               for engine in engines]
+    for worker in workers :
+        worker.start()
+
+    answer = None
+    failed = (ERROR, 0) # What to return if no engine answers
+    pending = len(workers)
+    try :
+        while pending > 0 :
+            wait = POLL
+            if deadline is not None :
+                wait = min(wait, deadline - timeit.default_timer())
+                if wait <= 0 : # Out of time
+                    failed = (TIMEOUT, 0)
+                    break
+            try :
+                engine, solution, nodes, seconds = results.get(timeout=wait)
+            except queue.Empty :
+                if not any(worker.is_alive() for worker in workers) and results.empty() :
+                    break # The engines still in the race died without answering
+                continue
+            pending = pending - 1
+            if solution is None : # This engine failed, the others may still answer
+                continue
+            if solution in STATUSES : # This engine ran out of budget
+                failed = (solution, nodes)
+                continue
+            answer = (solution, nodes, engine, seconds)
+            break
+    finally :
+        for worker in workers : # Kill the engines still running
+            if worker.is_alive() :
+                worker.terminate()
+        for worker in workers :
+            worker.join()
+        results.close()
+
+    if answer is None :
+        return failed[0], failed[1], None, timeit.default_timer() - timeStart
+    return answer
+
+
+# Append one race to the log
+# log => csv.DictWriter over LOG_FIELDS
+# sudoku => 2d array sudoku board
+# features => puzzle_features() of the board
+# winner / seconds / nodes => from race()
+def log_race(log, sudoku, features, winner, seconds, nodes) :
+    row = dict(features)
+    row.update({"puzzle" : sudoku2str(sudoku), "winner" : winner, "seconds" : seconds, "nodes" : nodes})
+    log.writerow(row)
+
+
+# Read the races logged by log_race()
+# Returns a list of (features, winner) pairs, features holding the values of FEATURES in order
+# path => csv log file
+def read_log(path) :
+    races = []
+    with open(path, 'r', newline='') as f :
+        for row in csv.DictReader(f) :
+            if row["winner"] :
+                races.append(([float(row[name]) for name in FEATURES], row["winner"]))
+
+    return races
+
+
+# Pick an engine for a puzzle from the logged races: the engine that won most often among the k logged puzzles
+# with the nearest features (every feature scaled by its largest value in the log)
+# Returns the name of the engine, or None if the log is empty
+# features => puzzle_features() of the puzzle
+# races => list from read_log()
+# k => number of neighbours that vote
+def pick_engine(features, races, k=5) :
+    if not races :
+        return None
+
+    scale = [max(abs(r[0][i]) for r in races) or 1.0 for i in range(len(FEATURES))]
+    point = [features[name] / scale[i] for i, name in enumerate(FEATURES)]
+    nearest = sorted(races, key=lambda r : sum((r[0][i] / scale[i] - point[i]) ** 2 for i in range(len(FEATURES))))[:k]
+
+    votes = {} # Nearest first, so a tie goes to the engine that won the nearest puzzle
+    for vals, winner in nearest :
+        votes[winner] = votes.get(winner, 0) + 1
+    return max(votes, key=votes.get)
+
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Race several sudoku solvers on every puzzle and keep the first answer, or pick one solver per puzzle from a log of earlier races.")
+    parser.add_argument("input", help="csv file, file with one puzzle per line, directory of csv files, or a one line puzzle")
+    parser.add_argument("-e", "--engines", nargs="+", choices=sorted(ENGINES), default=DEFAULT_PORTFOLIO, help="solvers to race (default: all but bruteforce)")
+    parser.add_argument("-t", "--time-limit", type=float, default=None, help="seconds each race may take (default: no limit)")
+    parser.add_argument("-n", "--node-limit", type=int, default=None, help="search nodes each engine may generate (default: no limit)")
+    parser.add_argument("-l", "--log", default=None, help="csv file to append the features and the winner of every race to")
+    parser.add_argument("-s", "--select", default=None, metavar="LOG", help="don't race, solve every puzzle with the engine picked from this race log")
+    args = parser.parse_args(argv)
+
+    if args.input.endswith(".csv") :
+        puzzles = [(args.input, csv2sudoku(args.input))]
+    elif os.path.exists(args.input) :
+        puzzles = read_puzzles(args.input)
+    else :
+        puzzles = [("1", line2sudoku(args.input))]
+
+    races = read_log(args.select) if args.select else None
+    log = None
+    if args.log :
+        newLog = not os.path.exists(args.log) or os.path.getsize(args.log) == 0
+        logFile = open(args.log, 'a', newline='')
+        log = csv.DictWriter(logFile, fieldnames=LOG_FIELDS)
+        if newLog :
+            log.writeheader()
+
+    wins = {}
+    timeStart = timeit.default_timer()
+    try :
+        for name, sudoku in puzzles :
+            features = puzzle_features(sudoku)
+            if races is not None :
+                winner = pick_engine(features, races) or args.engines[0]
+                engineStart = timeit.default_timer()
+                solution, nodes = solve(sudoku, winner, args.time_limit, args.node_limit)
+                seconds = timeit.default_timer() - engineStart
+                if solution in STATUSES :
+                    winner = None
+            else :
+                solution, nodes, winner, seconds = race(sudoku, args.engines, args.time_limit, args.node_limit)
+
+            wins[winner] = wins.get(winner, 0) + 1
+            if log is not None and races is None :
+                log_race(log, sudoku, features, winner, seconds, nodes)
+
+            if solution == -1 :
+                print("no solution")
+            elif solution in STATUSES or solution == ERROR :
+                print(solution)
+            else :
+                print(sudoku2str(solution))
+    finally :
+        if log is not None :
+            logFile.close()
+    elapsedTimeInSec = timeit.default_timer() - timeStart
+
+    print("Puzzles: " + str(len(puzzles)), file=sys.stderr)
+    print(("Engine picked: " if races is not None else "Wins: ") + str({str(engine) : count for engine, count in wins.items()}), file=sys.stderr)
+    print("Total time: " + str(elapsedTimeInSec) + " seconds", file=sys.stderr)
+
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,316 @@
+from collections import deque
+
+
+# Constraint propagation rules used by CSP.propagate()
+# Every rule works on the domains stored in a CSP object and makes its changes through csp.assign() / eliminate(),
+# so everything it does is recorded in the trail and can be rolled back with csp.undo()
+#
+# Each rule returns the number of changes it made (assignments or eliminations), or -1 if it found a contradiction
+# (a variable with no legal values, or a value with nowhere left to go in a unit)
+
+
+# Names of the rules, cheapest first --- also used as the keys of csp.rule_counts
+RULES = ["naked_single", "hidden_single", "naked_pair", "hidden_pair", "pointing", "box_line"]
+
+
+# Returns a fresh { rule : 0 } dictionary for csp.rule_counts
+# "ac3" counts the values removed by ac3(), which is not one of the propagate() rules
+def new_rule_counts() :
+    counts = {rule : 0 for rule in RULES}
+    counts["ac3"] = 0
+    return counts
+
+
+# Run every rule until none of them can make any more progress
+# The cheaper rules are always run to a fixpoint before the next, more expensive, rule is tried
+# Returns False if a contradiction was found
+# csp => CSP object
+def propagate(csp) :
+    counts = csp.rule_counts
+    r = 0
+    while r < len(RULES) :
+        n = RULE_FUNCTIONS[r](csp)
+        if n < 0 :
+            return False
+        if n > 0 :
+            counts[RULES[r]] += n
+            r = 0 # Something changed, so start over with the cheapest rule
+        else :
+            r = r + 1
+
+    return True
+
+
+# AC-3 over the binary not-equal constraints between every pair of peers
+# An arc (xi, xj) is revised by removing the values in the domain of xi that have no support in the domain of xj
+# For a not-equal constraint that only happens when xj has a single value left, and that value is removed from xi
+# Each arc is kept in the queue at most once at a time
+# Returns False if a variable is left with no legal values
+# csp => CSP object
+# arcs => arcs to start the queue with, as (xi, xj) flat index pairs (None = every arc on the board)
+def ac3(csp, arcs=None) :
+    peers = csp.geo.peers
+    domains = csp.domains
+
+    if arcs is None :
+        arcs = [(xi, xj) for xi in range(csp.geo.cells) for xj in peers[xi]]
+    queue = deque()
+    queued = set()
+    for arc in arcs :
+        if arc not in queued :
+            queued.add(arc)
+            queue.append(arc)
+
+    removed = 0
+    while queue :
+        arc = queue.popleft()
+        queued.discard(arc)
+        xi, xj = arc
+
+        # Revise (xi, xj)
+        dj = domains[xj]
+        if dj & (dj - 1) != 0 or not domains[xi] & dj :
+            continue
+        eliminate(csp, xi, dj)
+        removed = removed + 1
+        if domains[xi] == 0 :
+            csp.rule_counts["ac3"] += removed
+            return False
+
+        # The domain of xi shrank, so every arc pointing at it has to be checked again
+        for xk in peers[xi] :
+            if xk != xj :
+                arc = (xk, xi)
+                if arc not in queued :
+                    queued.add(arc)
+                    queue.append(arc)
+
+    csp.rule_counts["ac3"] += removed
+    return True
+
+
+# Remove the values in mask from the domain of idx, recording the change in the trail
+# Returns False if the domain is left empty
+# csp => CSP object
+# idx => flat index into the board
+# mask => bitmask of the values to remove
+def eliminate(csp, idx, mask) :
+    d = csp.domains[idx]
+    if d & mask :
+        csp.trail.append((idx, d))
+        d &= ~mask
+        csp.domains[idx] = d
+
+    return d != 0
+
+
+# Naked single: an empty variable with only one legal value left must take that value
+def naked_singles(csp) :
+    domains = csp.domains
+    values = csp.values
+    mask_values = csp.geo.mask_values
+    n = 0
+    for idx in range(csp.geo.cells) :
+        if values[idx] == 0 :
+            d = domains[idx]
+            if d == 0 :
+                return -1
+            if d & (d - 1) == 0 :
+                if not csp.assign(idx, mask_values[d][0]) :
+                    return -1
+                n = n + 1
+
+    return n
+
+
+# Hidden single: a value that only fits in one variable of a unit must go there
+def hidden_singles(csp) :
+    geo = csp.geo
+    domains = csp.domains
+    values = csp.values
+    n = 0
+    for unit in geo.units :
+        once, twice, placed = unit_counts(csp, unit)
+
+        if (once | placed) != geo.full : # Some value has nowhere left to go
+            return -1
+
+        singles = once & ~twice & ~placed
+        while singles :
+            bit = singles & -singles
+            singles ^= bit
+            for idx in unit :
+                if values[idx] == 0 and domains[idx] & bit :
+                    if not csp.assign(idx, bit.bit_length()) :
+                        return -1
+                    n = n + 1
+                    break
+
+    return n
+
+
+# Naked pair: two variables in a unit with the same two legal values take both of them,
+# so those values can be removed from every other variable in the unit
+def naked_pairs(csp) :
+    domains = csp.domains
+    values = csp.values
+    n = 0
+    for unit in csp.geo.units :
+        seen = {} # { pair mask : idx }
+        for idx in unit :
+            d = domains[idx]
+            if values[idx] != 0 or d.bit_count() != 2 :
+                continue
+            if d not in seen :
+                seen[d] = idx
+                continue
+
+            first = seen[d]
+            for other in unit :
+                if other != idx and other != first and values[other] == 0 and domains[other] & d :
+                    if not eliminate(csp, other, d) :
+                        return -1
+                    n = n + 1
+
+    return n
+
+
+# Hidden pair: two values that can only go in the same two variables of a unit take up both of them,
+# so every other value can be removed from those two variables
+def hidden_pairs(csp) :
+    domains = csp.domains
+    values = csp.values
+    size = csp.geo.size
+    n = 0
+    for unit in csp.geo.units :
+        # places[v] => bitmask of the positions (in the unit) where v can still go
+        places = [0] * (size + 1)
+        for pos in range(size) :
+            idx = unit[pos]
+            if values[idx] == 0 :
+                for v in csp.geo.mask_values[domains[idx]] :
+                    places[v] |= 1 << pos
+
+        seen = {} # { positions mask : value }
+        for v in range(1, size + 1) :
+            p = places[v]
+            if p.bit_count() != 2 :
+                continue
+            if p not in seen :
+                seen[p] = v
+                continue
+
+            pair = (1 << (v - 1)) | (1 << (seen[p] - 1))
+            while p :
+                pos = (p & -p).bit_length() - 1
+                p &= p - 1
+                if domains[unit[pos]] & ~pair :
+                    eliminate(csp, unit[pos], ~pair)
+                    n = n + 1
+
+    return n
+
+
+# Pointing: if every place left for a value inside a box lies on one row (or column),
+# the value can be removed from the rest of that row (or column)
+def pointing(csp) :
+    geo = csp.geo
+    domains = csp.domains
+    values = csp.values
+    n = 0
+    for b in range(geo.size) :
+        box = geo.boxes[b]
+        once, twice, placed = unit_counts(csp, box)
+        candidates = once & ~placed
+        while candidates :
+            bit = candidates & -candidates
+            candidates ^= bit
+
+            # Bitmasks of the rows and columns the value can still go in
+            rows = cols = 0
+            for idx in box :
+                if values[idx] == 0 and domains[idx] & bit :
+                    rows |= 1 << geo.row_of[idx]
+                    cols |= 1 << geo.col_of[idx]
+
+            if rows and rows & (rows - 1) == 0 :
+                k = eliminate_outside(csp, geo.rows[rows.bit_length() - 1], b, bit)
+                if k < 0 :
+                    return -1
+                n = n + k
+            if cols and cols & (cols - 1) == 0 :
+                k = eliminate_outside(csp, geo.cols[cols.bit_length() - 1], b, bit)
+                if k < 0 :
+                    return -1
+                n = n + k
+
+    return n
+
+
+# Box-line reduction: if every place left for a value in a row (or column) lies inside one box,
+# the value can be removed from the rest of that box
+def box_line(csp) :
+    geo = csp.geo
+    domains = csp.domains
+    values = csp.values
+    n = 0
+    for u in range(2 * geo.size) : # The rows and columns come first in geo.units
+        line = geo.units[u]
+        kind = 0 if u < geo.size else 1 # Which entry of geo.cell_units points back at this line
+        once, twice, placed = unit_counts(csp, line)
+        candidates = once & ~placed
+        while candidates :
+            bit = candidates & -candidates
+            candidates ^= bit
+
+            # Bitmask of the boxes the value can still go in
+            boxes = 0
+            for idx in line :
+                if values[idx] == 0 and domains[idx] & bit :
+                    boxes |= 1 << geo.box_of[idx]
+
+            if boxes and boxes & (boxes - 1) == 0 :
+                for idx in geo.boxes[boxes.bit_length() - 1] :
+                    if geo.cell_units[idx][kind] != u and values[idx] == 0 and domains[idx] & bit :
+                        if not eliminate(csp, idx, bit) :
+                            return -1
+                        n = n + 1
+
+    return n
+
+
+# Returns (once, twice, placed) for a unit
+# once => values that fit in at least one empty variable / twice => values that fit in at least two
+# placed => values already placed in the unit
+# csp => CSP object
+# unit => list of flat indices
+def unit_counts(csp, unit) :
+    domains = csp.domains
+    values = csp.values
+    once = twice = placed = 0
+    for idx in unit :
+        if values[idx] == 0 :
+            d = domains[idx]
+            twice |= once & d
+            once |= d
+        else :
+            placed |= 1 << (values[idx] - 1)
+
+    return once, twice, placed
+
+
+# Remove bit from every empty variable in line that is not inside box b
+# Returns the number of variables changed, or -1 if one was left with no legal values
+def eliminate_outside(csp, line, b, bit) :
+    n = 0
+    for idx in line :
+        if csp.geo.box_of[idx] != b and csp.values[idx] == 0 and csp.domains[idx] & bit :
+            if not eliminate(csp, idx, bit) :
+                return -1
+            n = n + 1
+
+    return n
+
+
+# Rule functions in the same order as RULES
+RULE_FUNCTIONS = [naked_singles, hidden_singles, naked_pairs, hidden_pairs, pointing, box_line]
@@ -0,0 +1,184 @@
+import timeit
+from csp_A20463413 import CSP
+
+
+# Returned by the solvers in place of the solution when they ran out of time / nodes before finishing
+# (-1 still means the puzzle has no solution)
+TIMEOUT = "timeout"
+NODE_LIMIT = "node limit"
+STATUSES = (TIMEOUT, NODE_LIMIT)
+
+
+# Iterative backtracking search on an explicit stack instead of Python recursion, so it can be stopped at any node
+# and picked up again later with run(), and a 25x25 board doesn't get anywhere near the recursion limit
+# What gets searched is decided by the two functions it is given:
+#   select(csp, start) => flat index of the next variable to assign, or -1 once the assignment is complete
+#                         (start is the flat index after the parent's variable)
+#   apply(csp, var, val) => assign val to var = (row, col), recording every change in csp.trail
+#                           Returns False if the value fails (the changes are still undone)
+# and optionally a third one that decides in which order the values of a variable are tried:
+#   order(csp, idx, vals) => list of the values in vals, in the order to try them (None = ascending)
+# Every node counts the same way as the recursive searches did (one per variable selected)
+# csp => CSP object
+# stack => one frame per open node --- [flat index, values to try, next value position, trail mark, depth]
+# nodes => how many search nodes were generated so far
+# status => "ready", "solved", "failed", "paused" (node limit reached) or "timeout" (time limit reached)
+# solution => the solved 2d board, or -1
+# seconds => time spent inside run() so far
+# stats => SearchStats object to fill in (None = no instrumentation)
+class Search :
+    def __init__(self, csp : CSP, select, apply, stats=None, order=None) :
+        self.csp = csp
+        self.select = select
+        self.apply = apply
+        self.order = order
+        self.stats = stats
+        self.stack = []
+        self.nodes = 0
+        self.status = "ready"
+        self.solution = -1
+        self.seconds = 0.0
+
+
+    # Open a new search node, selecting its variable
+    # Returns True if the node completed the assignment
+    # start => flat index after the parent's variable
+    # depth => depth of the node
+    def expand(self, start, depth) :
+        self.nodes = self.nodes + 1
+        if self.stats is not None :
+            self.stats.enter(depth)
+
+        csp = self.csp
+        idx = self.select(csp, start)
+        if idx == -1 : # Is assignment complete?
+            if self.stats is not None :
+                self.stats.solution_depth = depth
+            self.solution = csp.board()
+            return True
+
+        vals = csp.legal_values(csp.geo.coords[idx])
+        if self.order is not None :
+            vals = self.order(csp, idx, vals)
+        self.stack.append([idx, vals, 0, csp.mark(), depth])
+        return False
+
+
+    # Search until the puzzle is solved or shown to have no solution, or until a limit is reached
+    # Calling run() again after "paused" or "timeout" carries on from exactly where it stopped
+    # Returns the new status
+    # time_limit => seconds this call may run for (None = no limit)
+    # node_limit => nodes this call may generate (None = no limit)
+    def run(self, time_limit=None, node_limit=None) :
+        if self.status in ("solved", "failed") :
+            return self.status
+
+        timeStart = timeit.default_timer()
+        deadline = None if time_limit is None else timeStart + time_limit
+        stopAt = None if node_limit is None else self.nodes + node_limit
+        self.status = self.loop(deadline, stopAt)
+        self.seconds = self.seconds + timeit.default_timer() - timeStart
+
+        return self.status
+
+
+    # The search loop behind run()
+    # Returns the new status
+    # deadline => timer value to stop at (None = no limit)
+    # stopAt => node count to stop at (None = no limit)
+    def loop(self, deadline, stopAt) :
+        csp = self.csp
+        stack = self.stack
+        apply = self.apply
+        coords = csp.geo.coords
+
+        if self.status == "ready" and self.expand(0, 0) :
+            return "solved"
+
+        while stack :
+            if stopAt is not None and self.nodes >= stopAt :
+                return "paused"
+            if deadline is not None and timeit.default_timer() >= deadline :
+                return "timeout"
+
+            frame = stack[-1]
+            idx, vals, pos, mark, depth = frame
+            csp.undo(mark) # Roll back the value tried last (nothing to do the first time)
+
+            if pos == len(vals) : # Every value failed, so return failure to the parent
+                stack.pop()
+                continue
+
+            frame[2] = pos + 1
+            if apply(csp, coords[idx], vals[pos]) and self.expand(idx + 1, depth + 1) :
+                return "solved"
+
+        return "failed"
+
+
+    # Returns the solution (-1 if there is none yet), the nodes and the status along with the partial statistics
+    def result(self) :
+        return {
+            "status" : self.status,
+            "solution" : self.solution,
+            "nodes" : self.nodes,
+            "depth" : len(self.stack),
+            "seconds" : self.seconds,
+        }
+
+
+
+
+
+# ---- The classes and functions below are not part of the Search class ---- #
+
+# Wall-clock and node budget for the recursive searches (bruteforce() and Dancing Links), which count
+# their nodes through spend()
+# A node limit means the same as it does for Search.run(): at most node_limit nodes are generated, and the node
+# that would go over it is not counted
+# deadline => timer value to stop at (None = no limit)
+# node_limit => nodes that may be generated (None = no limit)
+# nodes => nodes spent so far
+class Budget :
+    def __init__(self, time_limit=None, node_limit=None) :
+        self.deadline = None if time_limit is None else timeit.default_timer() + time_limit
+        self.node_limit = node_limit
+        self.nodes = 0
+
+
+    # Spend one node, before it is generated
+    # The clock is only read every 64 nodes, since a node is much cheaper than reading it
+    # Returns None while there is budget left (the node is counted), otherwise TIMEOUT or NODE_LIMIT
+    def spend(self) :
+        if self.node_limit is not None and self.nodes >= self.node_limit :
+            return NODE_LIMIT
+        self.nodes = self.nodes + 1
+        if self.deadline is not None and self.nodes & 63 == 0 and timeit.default_timer() >= self.deadline :
+            return TIMEOUT
+
+        return None
+
+
+# Returns a Budget for the given limits, or None if there are no limits at all
+# time_limit => seconds (None = no limit)
+# node_limit => nodes (None = no limit)
+def make_budget(time_limit=None, node_limit=None) :
+    if time_limit is None and node_limit is None :
+        return None
+
+    return Budget(time_limit, node_limit)
+
+
+# Run a Search under the given limits
+# Returns (solution, nodes) like the solver functions, with TIMEOUT or NODE_LIMIT as the solution if it ran out
+# search => Search object
+# time_limit => seconds (None = no limit)
+# node_limit => nodes (None = no limit)
+def run_search(search : Search, time_limit=None, node_limit=None) :
+    status = search.run(time_limit, node_limit)
+    if status == "timeout" :
+        return TIMEOUT, search.nodes
+    if status == "paused" :
+        return NODE_LIMIT, search.nodes
+
+    return search.solution, search.nodes
@@ -0,0 +1,288 @@
+import argparse
+import asyncio
+import json
+import os
+import timeit
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from urllib.parse import urlsplit, parse_qs
+from algorithms_A20463413 import line2sudoku
+from engines_A20463413 import ENGINES, DEFAULT_ENGINE, solve
+from batch_A20463413 import solve_timed, percentile
+from search_A20463413 import STATUSES
+
+
+# Extra seconds a request gets on top of its timeout before the service stops waiting for the worker
+# (the solver is given the timeout as its own budget, so it normally gives up first)
+GRACE = 0.5
+
+# How many of the latest latencies are kept for the percentiles
+LATENCY_WINDOW = 10000
+
+# Largest request body read, the biggest puzzle is 625 characters
+MAX_BODY = 4096
+
+# Reason phrases for the status codes the service sends
+REASONS = {200 : "OK", 400 : "Bad Request", 404 : "Not Found", 405 : "Method Not Allowed", 500 : "Internal Server Error", 504 : "Gateway Timeout"}
+
+
+# Runs once in every worker process when the pool starts, so the first real request doesn't pay for the imports
+# and the geometry tables
+def warm_up() :
+    solve(line2sudoku("X" * 81))
+    return os.getpid()
+
+
+# Local HTTP service that solves one line puzzles on a pool of worker processes
+# POST /solve?engine=NAME&timeout=SECONDS with the puzzle as the body returns the solved puzzle as one line,
+# "no solution", or "timeout" / "node limit" (status 504)
+# GET /stats returns the counters as json
+# Requests on one connection may be pipelined, they are solved concurrently and answered in order
+# pool => ProcessPoolExecutor the puzzles are solved on
+# engine => solver used when a request doesn't ask for one
+# timeout => seconds a request may take when it doesn't ask for a limit (None = no limit)
+class Service :
+    def __init__(self, engine=DEFAULT_ENGINE, workers=None, timeout=None) :
+        self.engine = engine
+        self.timeout = timeout
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.started = timeit.default_timer()
+        self.requests = 0
+        self.completed = 0
+        self.solved = 0
+        self.unsolvable = 0
+        self.timedOut = 0
+        self.errors = 0
+        self.inFlight = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+
+    # Start every worker process up front
+    def warm(self) :
+        wait([self.pool.submit(warm_up) for i in range(self.workers)])
+
+
+    def close(self) :
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+    # Solve one puzzle on the pool
+    # Returns (status code, body)
+    # sudoku => 2d array sudoku board
+    # engine => name of the solver in ENGINES
+    # timeout => seconds the request may take (None = no limit)
+    async def solve(self, sudoku, engine, timeout) :
+        job = (sudoku, engine, timeout, None)
+        future = asyncio.get_running_loop().run_in_executor(self.pool, solve_timed, job)
+        try :
+            solution, nodes, seconds = await asyncio.wait_for(future, None if timeout is None else timeout + GRACE)
+        except asyncio.TimeoutError :
+            solution = STATUSES[0]
+
+        if solution == -1 :
+            self.unsolvable = self.unsolvable + 1
+            return 200, "no solution"
+        if solution in STATUSES :
+            self.timedOut = self.timedOut + 1
+            return 504, solution
+
+        self.solved = self.solved + 1
+        return 200, solution
+
+
+    # Work out the answer to one request
+    # Returns (status code, content type, body)
+    # method => HTTP method
+    # target => request target (path and query)
+    # body => request body
+    async def respond(self, method, target, body) :
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if url.path == "/stats" :
+            return 200, "application/json", json.dumps(self.stats())
+        if url.path != "/solve" :
+            return 404, "text/plain", "not found"
+        if method != "POST" :
+            return 405, "text/plain", "use POST"
+
+        engine = query.get("engine", [self.engine])[0]
+        if engine not in ENGINES :
+            return 400, "text/plain", "unknown engine"
+        try : # Length and characters are checked here, before anything is sent to the pool
+            sudoku = line2sudoku(body)
+        except ValueError as e :
+            return 400, "text/plain", str(e)
+        try :
+            timeout = float(query["timeout"][0]) if "timeout" in query else self.timeout
+        except ValueError :
+            return 400, "text/plain", "bad timeout"
+
+        self.requests = self.requests + 1
+        self.inFlight = self.inFlight + 1
+        timeStart = timeit.default_timer()
+        try :
+            status, text = await self.solve(sudoku, engine, timeout)
+        except Exception : # A broken pool or a solver that crashed, the details are not the client's business
+            self.errors = self.errors + 1
+            status, text = 500, "internal error"
+        finally :
+            self.inFlight = self.inFlight - 1
+        self.completed = self.completed + 1
+        self.latencies.append(timeit.default_timer() - timeStart)
+
+        return status, "text/plain", text
+
+
+    # Serve one connection, answering pipelined requests in the order they came in
+    # reader / writer => asyncio streams of the connection
+    async def handle_connection(self, reader, writer) :
+        answers = asyncio.Queue()
+
+        async def write_answers() :
+            while True :
+                task = await answers.get()
+                if task is None :
+                    break
+                status, contentType, text = await task
+                data = text.encode()
+                writer.write(("HTTP/1.1 " + str(status) + " " + REASONS[status] + "\r\n"
+                              "Content-Type: " + contentType + "\r\n"
+                              "Content-Length: " + str(len(data)) + "\r\n\r\n").encode() + data)
+                await writer.drain()
+
+        writerTask = asyncio.create_task(write_answers())
+        try :
+            while True :
+                request = await read_request(reader)
+                if request is None :
+                    break
+                if request == -1 :
+                    await answers.put(asyncio.create_task(answer(400, "text/plain", "bad request")))
+                    break
+
+                method, target, headers, body = request
+                await answers.put(asyncio.create_task(self.respond(method, target, body)))
+                if headers.get("connection", "").lower() == "close" :
+                    break
+        except ConnectionError :
+            pass
+        finally :
+            await answers.put(None)
+            try :
+                await writerTask
+            except ConnectionError :
+                pass
+            writer.close()
+
+
+    # Throughput and latency counters
+    def stats(self) :
+        uptime = timeit.default_timer() - self.started
+        latencies = list(self.latencies)
+        return {
+            "uptime" : uptime,
+            "workers" : self.workers,
+            "requests" : self.requests,
+            "completed" : self.completed,
+            "in_flight" : self.inFlight,
+            "solved" : self.solved,
+            "no_solution" : self.unsolvable,
+            "timed_out" : self.timedOut,
+            "errors" : self.errors,
+            "throughput" : self.completed / uptime if uptime > 0 else 0.0,
+            "p50_latency" : percentile(latencies, 50),
+            "p99_latency" : percentile(latencies, 99),
+        }
+
+
+
+
+
+# ---- The functions below are not part of the class ---- #
+
+# Returns the answer it is given, so a fixed answer can go in the same queue as the ones still being worked out
+async def answer(status, contentType, text) :
+    return status, contentType, text
+
+
+# Read one HTTP/1.1 request
+# Returns (method, target, headers, body), None when the connection was closed (also in the middle of a request),
+# or -1 if the request is malformed (a body that isn't utf-8 or is longer than MAX_BODY too)
+# reader => asyncio stream of the connection
+async def read_request(reader) :
+    try :
+        return await read_request_parts(reader)
+    except asyncio.IncompleteReadError :
+        return None
+    except ValueError : # A line longer than the stream's limit
+        return -1
+
+
+# The parts of read_request() that may raise while reading the connection
+# reader => asyncio stream of the connection
+async def read_request_parts(reader) :
+    line = await reader.readline()
+    if not line :
+        return None
+
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3 :
+        return -1
+    method, target, version = parts
+
+    headers = {}
+    while True :
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b"") :
+            break
+        name, sep, value = line.decode("latin-1").partition(":")
+        if not sep :
+            return -1
+        headers[name.strip().lower()] = value.strip()
+
+    try :
+        length = int(headers.get("content-length", "0"))
+    except ValueError :
+        return -1
+    if not 0 <= length <= MAX_BODY :
+        return -1
+    try :
+        body = (await reader.readexactly(length)).decode() if length > 0 else ""
+    except UnicodeDecodeError :
+        return -1
+
+    return method, target, headers, body
+
+
+# Run the service until it is interrupted
+# service => Service object
+# host / port => where to listen
+async def serve(service : Service, host="127.0.0.1", port=8480) :
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    async with server :
+        await server.serve_forever()
+
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Serve the sudoku solvers over HTTP on localhost.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+    parser.add_argument("-p", "--port", type=int, default=8480, help="port to listen on (default: %(default)s)")
+    parser.add_argument("-e", "--engine", choices=sorted(ENGINES), default=DEFAULT_ENGINE, help="solver used when a request doesn't pick one (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: one per CPU)")
+    parser.add_argument("-t", "--timeout", type=float, default=None, help="seconds a request may take when it doesn't set its own (default: no limit)")
+    args = parser.parse_args(argv)
+
+    service = Service(args.engine, args.workers, args.timeout)
+    service.warm()
+    print("Listening on http://" + args.host + ":" + str(args.port) + " with " + str(service.workers) + " workers", flush=True)
+    try :
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt :
+        pass
+    finally :
+        service.close()
+
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import itertools
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from algorithms_A20463413 import line2sudoku
+from engines_A20463413 import ENGINES, DEFAULT_ENGINE
+from batch_A20463413 import solve_timed, is_error
+from search_A20463413 import STATUSES
+
+
+# Lazily read one line puzzles from an open file
+# Blank lines and lines starting with # are skipped
+# Yields 2d array sudoku boards, one at a time, and for a line that isn't a puzzle a message starting with its
+# line number in its place (solve_timed() turns that into an error result, so the stream keeps going)
+# f => open text file (or sys.stdin)
+def read_stream(f) :
+    for lineNum, line in enumerate(f, 1) :
+        line = line.strip()
+        if line and not line.startswith("#") :
+            try :
+                yield line2sudoku(line)
+            except ValueError as e :
+                yield "line " + str(lineNum) + ": " + str(e)
+
+
+# Lazily solve a stream of puzzles, yielding the results in input order
+# With more than one worker the puzzles are read and solved batch_size at a time, the next batch is handed to the pool
+# before the results of the current one are yielded so the workers never wait on the consumer,
+# and no more than two batches are ever held in memory
+# Yields (solution, nodes, seconds) like batch_A20463413.solve_timed()
+# sudokus => iterable of 2d array sudoku boards
+# engine => name of the solver in ENGINES
+# workers => number of worker processes (1 = solve in this process)
+# batch_size => puzzles read ahead and handed to the pool at once
+# time_limit => seconds each puzzle may take (None = no limit)
+# node_limit => nodes each puzzle may generate (None = no limit)
+def solve_stream(sudokus, engine=DEFAULT_ENGINE, workers=1, batch_size=1000, time_limit=None, node_limit=None) :
+    if workers == 1 :
+        for sudoku in sudokus :
+            yield solve_timed((sudoku, engine, time_limit, node_limit))
+        return
+
+    chunksize = max(1, batch_size // (workers * 4))
+    sudokus = iter(sudokus)
+
+    # Hand the next batch to the pool (map() submits every job straight away)
+    # Returns the iterator over its results, or None at the end of the stream
+    def submit(pool) :
+        jobs = [(sudoku, engine, time_limit, node_limit) for sudoku in itertools.islice(sudokus, batch_size)]
+        return pool.map(solve_timed, jobs, chunksize=chunksize) if jobs else None
+
+    with ProcessPoolExecutor(max_workers=workers) as pool :
+        pending = submit(pool)
+        while pending is not None :
+            current = pending
+            pending = submit(pool)
+            yield from current
+
+
+# Write the results from solve_stream() as one line each, collecting buffer_size lines per write() call
+# Returns (puzzles, solved, nodes) totals, the lines that weren't puzzles are written as "error: line N: ..."
+# results => iterable of (solution, nodes, seconds)
+# out => open text file (or sys.stdout)
+# buffer_size => number of lines written at once
+def write_stream(results, out, buffer_size=4096) :
+    puzzles = solved = nodes = 0
+    buffer = []
+    for solution, n, elapsedTimeInSec in results :
+        puzzles = puzzles + 1
+        nodes = nodes + n
+        if solution == -1 :
+            buffer.append("no solution\n")
+        elif solution in STATUSES or is_error(solution) :
+            buffer.append(solution + "\n")
+        else :
+            solved = solved + 1
+            buffer.append(solution + "\n")
+
+        if len(buffer) >= buffer_size :
+            out.write("".join(buffer))
+            buffer.clear()
+
+    if buffer :
+        out.write("".join(buffer))
+
+    return puzzles, solved, nodes
+
+
+def main(argv=None) :
+    parser = argparse.ArgumentParser(description="Stream one line sudoku puzzles through a solver with bounded memory.")
+    parser.add_argument("input", nargs="?", default="-", help="file with one 81 character puzzle per line (default: stdin)")
+    parser.add_argument("-e", "--engine", choices=sorted(ENGINES), default=DEFAULT_ENGINE, help="solver to use (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of worker processes (default: %(default)s)")
+    parser.add_argument("-b", "--batch-size", type=int, default=1000, help="puzzles read ahead for the worker pool (default: %(default)s)")
+    parser.add_argument("-o", "--output", default="-", help="file to write the solutions to (default: stdout)")
+    parser.add_argument("-t", "--time-limit", type=float, default=None, help="seconds each puzzle may take (default: no limit)")
+    parser.add_argument("-n", "--node-limit", type=int, default=None, help="search nodes each puzzle may generate (default: no limit)")
+    args = parser.parse_args(argv)
+
+    inFile = sys.stdin if args.input == "-" else open(args.input, 'r', encoding='utf-8-sig')
+    outFile = sys.stdout if args.output == "-" else open(args.output, 'w', buffering=1 << 16)
+    try :
+        results = solve_stream(read_stream(inFile), args.engine, args.workers, args.batch_size, args.time_limit, args.node_limit)
+        puzzles, solved, nodes = write_stream(results, outFile)
+    finally :
+        if inFile is not sys.stdin :
+            inFile.close()
+        if outFile is not sys.stdout :
+            outFile.close()
+
+    print("Puzzles: " + str(puzzles) + " (" + str(solved) + " solved)", file=sys.stderr)
+    print("Number of search tree nodes generated: " + str(nodes), file=sys.stderr)
+
+
+if __name__ == "__main__" :
+    main()
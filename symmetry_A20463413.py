@@ -0,0 +1,246 @@
+import itertools
+import math
+from geometry_A20463413 import get_geometry
+
+
+# Most partial transforms canonical_form() tries (every start, and every row tried next for every state kept)
+# Typical 9x9 puzzles need a few thousand at most. Very sparse or very symmetric boards (an empty board or a solved
+# grid need hundreds of thousands) fall back to relabel_form() instead: still a correct transform of the puzzle,
+# only an equivalent puzzle turned another way will miss in the cache
+MAX_WORK = 10000
+
+
+# Turn a 2d sudoku board into a flat list of ints (0 = empty)
+# sudoku => 2d array sudoku board
+def board2flat(sudoku) :
+    return [x if type(x) is int else 0 for row in sudoku for x in row]
+
+
+# Turn a flat list of ints back into a 2d sudoku board ("X" = empty)
+# flat => flat list of ints
+# geo => Geometry object for the board size
+def flat2board(flat, geo) :
+    size = geo.size
+    return [[flat[row * size + col] or "X" for col in range(size)] for row in range(size)]
+
+
+# Returns the transpose of a flat board
+# flat => flat list of ints
+# geo => Geometry object for the board size
+def transpose(flat, geo) :
+    size = geo.size
+    return [flat[col * size + row] for row in range(size) for col in range(size)]
+
+
+# Every column order that puts row (a flat list of size values) into its smallest pattern:
+# stacks ordered by how many values they hold (fewest first) and the empty cells first inside every stack
+# Once relabeled, the first row of the canonical form only depends on where its empty cells are, so this is exactly
+# the set of column orders that give the smallest first row
+# row => list of values
+# geo => Geometry object for the board size
+def first_row_orders(row, geo) :
+    box = geo.box
+    stacks = []
+    for stack in range(box) :
+        cols = range(stack * box, (stack + 1) * box)
+        empty = [col for col in cols if row[col] == 0]
+        full = [col for col in cols if row[col] != 0]
+        inside = [a + b for a in itertools.permutations(empty) for b in itertools.permutations(full)]
+        stacks.append((len(full), inside))
+
+    counts = sorted(count for count, inside in stacks)
+    orders = []
+    for stackOrder in itertools.permutations(range(box)) :
+        if [stacks[s][0] for s in stackOrder] != counts :
+            continue
+        for parts in itertools.product(*[stacks[s][1] for s in stackOrder]) :
+            orders.append(tuple(col for part in parts for col in part))
+
+    return orders
+
+
+# Returns the smallest pattern of row (0 = empty, 1 = value), which is what first_row_orders() produces
+# row => list of values
+# geo => Geometry object for the board size
+def first_row_pattern(row, geo) :
+    box = geo.box
+    counts = sorted(sum(1 for col in range(stack * box, (stack + 1) * box) if row[col] != 0) for stack in range(box))
+    return tuple(v for count in counts for v in [0] * (box - count) + [1] * count)
+
+
+# Find the canonical form of a puzzle: the lexicographically smallest board (empty cells = 0) over every
+# transposition, band and stack order, row order inside a band, column order inside a stack, and relabeling of values
+# Equivalent puzzles get the same canonical form, so it can be used as a cache key
+# Boards bigger than 9x9 have far too many column orders to go through, so only their values are relabeled
+# (the same goes for 9x9 boards that would take more than MAX_WORK partial transforms)
+# Returns (canonical flat board, transform), where transform = (transposed, rows, cols, labels) and
+#   canonical[i * size + j] = labels[board[rows[i] * size + cols[j]]] (board transposed first if transposed is True)
+# The labels cover every value (the ones missing from the puzzle get the unused labels in order)
+# sudoku => 2d array sudoku board
+# geo => Geometry object for the board size (None = work it out from the board)
+def canonical_form(sudoku, geo=None) :
+    if geo is None :
+        geo = get_geometry(math.isqrt(len(sudoku)))
+    box = geo.box
+    size = geo.size
+
+    flat = board2flat(sudoku)
+    if box > 3 :
+        return relabel_form(flat, geo)
+    boards = [flat, transpose(flat, geo)]
+
+    # The first row only depends on where the empty cells are (every value in it gets a new label, in order)
+    best = None
+    starts = []
+    for t in range(2) :
+        for row in range(size) :
+            cells = boards[t][row * size : (row + 1) * size]
+            pattern = first_row_pattern(cells, geo)
+            if best is None or pattern < best :
+                best = pattern
+                starts = []
+            if pattern == best :
+                starts.append((t, row))
+
+    # Every start is kept, cutting them before the second row ranks them would make the form depend on how the puzzle
+    # was turned. They all have the same pattern, so the same number of column orders
+    t, row = starts[0]
+    work = len(starts) * len(first_row_orders(boards[t][row * size : (row + 1) * size], geo))
+    if work > MAX_WORK :
+        return relabel_form(flat, geo)
+
+    # state => (transposed, rows so far, column order, labels so far)
+    states = []
+    for t, row in starts :
+        cells = boards[t][row * size : (row + 1) * size]
+        for cols in first_row_orders(cells, geo) :
+            labels = {}
+            for col in cols :
+                v = cells[col]
+                if v != 0 :
+                    labels[v] = len(labels) + 1
+            states.append((t, (row,), cols, labels))
+
+    # Every other row is the smallest one that the band structure allows next, kept for every state that ties
+    for step in range(1, size) :
+        best = None
+        nextStates = []
+        for t, rows, cols, labels in states :
+            board = boards[t]
+            if step % box == 0 : # Start a new band, any row of any band not used yet
+                usedBands = {row // box for row in rows}
+                choices = [row for row in range(size) if row // box not in usedBands]
+            else : # Carry on with the rest of the current band
+                band = rows[-1] // box
+                choices = [row for row in range(band * box, (band + 1) * box) if row not in rows]
+            work = work + len(choices)
+
+            for row in choices :
+                base = row * size
+                new = {}
+                line = []
+                tie = best is not None # Every cell so far equals best, stop at the first one bigger than it
+                for col in cols :
+                    v = board[base + col]
+                    if v == 0 :
+                        x = 0
+                    elif v in labels :
+                        x = labels[v]
+                    else :
+                        if v not in new :
+                            new[v] = len(labels) + len(new) + 1
+                        x = new[v]
+                    if tie :
+                        if x > best[len(line)] :
+                            break
+                        tie = x == best[len(line)]
+                    line.append(x)
+                else :
+                    line = tuple(line)
+                    if best is None or line < best :
+                        best = line
+                        nextStates = []
+                    if line == best :
+                        merged = labels
+                        if new :
+                            merged = dict(labels)
+                            merged.update(new)
+                        nextStates.append((t, rows + (row,), cols, merged))
+        states = nextStates
+        if work > MAX_WORK :
+            return relabel_form(flat, geo)
+
+    t, rows, cols, labels = states[0]
+    transform = (t == 1, rows, cols, full_labels(labels, size))
+    return apply_transform(flat, transform, geo), transform
+
+
+# The canonical form for big boards: the board as it is, with its values relabeled in the order they first appear
+# Returns (canonical flat board, transform) like canonical_form()
+# flat => flat list of ints (0 = empty)
+# geo => Geometry object for the board size
+def relabel_form(flat, geo) :
+    labels = {}
+    for v in flat :
+        if v != 0 and v not in labels :
+            labels[v] = len(labels) + 1
+
+    order = tuple(range(geo.size))
+    transform = (False, order, order, full_labels(labels, geo.size))
+    return apply_transform(flat, transform, geo), transform
+
+
+# Turn the labels of the values in a puzzle into labels for every value (0 stays 0),
+# giving the values missing from the puzzle the labels left over, in order
+# Returns a tuple --- value -> label
+# labels => dictionary --- value -> label
+# size => number of values
+def full_labels(labels, size) :
+    full = [0] * (size + 1)
+    for v, label in labels.items() :
+        full[v] = label
+    unused = iter(sorted(set(range(1, size + 1)) - set(labels.values())))
+    for v in range(1, size + 1) :
+        if full[v] == 0 :
+            full[v] = next(unused)
+
+    return tuple(full)
+
+
+# Map a flat board through a transform from canonical_form()
+# Returns the flat board in canonical coordinates and labels
+# flat => flat list of ints (0 = empty)
+# transform => (transposed, rows, cols, labels)
+# geo => Geometry object for the board size
+def apply_transform(flat, transform, geo) :
+    transposed, rows, cols, labels = transform
+    if transposed :
+        flat = transpose(flat, geo)
+
+    size = geo.size
+    return [labels[flat[row * size + col]] for row in rows for col in cols]
+
+
+# Map a flat board in canonical coordinates and labels back through a transform (the inverse of apply_transform())
+# Returns the flat board in the original coordinates and values
+# canonical => flat list of ints (0 = empty)
+# transform => (transposed, rows, cols, labels)
+# geo => Geometry object for the board size
+def invert_transform(canonical, transform, geo) :
+    transposed, rows, cols, labels = transform
+    size = geo.size
+
+    values = [0] * len(labels)
+    for v, label in enumerate(labels) :
+        values[label] = v
+
+    flat = [0] * geo.cells
+    for i in range(size) :
+        base = rows[i] * size
+        for j in range(size) :
+            flat[base + cols[j]] = values[canonical[i * size + j]]
+
+    if transposed :
+        flat = transpose(flat, geo)
+
+    return flat
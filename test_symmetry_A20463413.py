@@ -0,0 +1,97 @@
+import os
+import random
+import pytest
+from algorithms_A20463413 import csv2sudoku, line2sudoku
+from geometry_A20463413 import get_geometry
+from symmetry_A20463413 import canonical_form, relabel_form, apply_transform, invert_transform, board2flat, flat2board
+
+
+# Directory the test csv files are in
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Puzzles the tests run on: (name, 2d board)
+PUZZLES = [
+    ("testcase1", csv2sudoku(os.path.join(HERE, "testcase1.csv"))),
+    ("testcase2", csv2sudoku(os.path.join(HERE, "testcase2.csv"))),
+    ("testcase3", csv2sudoku(os.path.join(HERE, "testcase3.csv"))),
+    ("testcase5", csv2sudoku(os.path.join(HERE, "testcase5.csv"))),
+    ("4x4", line2sudoku("1XXX" "XX3X" "X4XX" "XXX2")),
+]
+
+# Boards that would take more than MAX_WORK partial transforms: (name, 2d board)
+HEAVY = [
+    ("solved", csv2sudoku(os.path.join(HERE, "testcase4_solution.csv"))),
+    ("empty", [["X"] * 9 for i in range(9)]),
+]
+
+# Random transforms tried on every puzzle
+ROUNDS = 20
+
+
+# Apply a random sudoku symmetry to a board: swap bands, swap stacks, shuffle the rows inside every band and the
+# columns inside every stack, maybe transpose, and relabel the values
+# Returns the new 2d board
+# sudoku => 2d array sudoku board
+# rng => random.Random object
+def shuffle_board(sudoku, rng) :
+    size = len(sudoku)
+    box = get_geometry(int(size ** 0.5)).box
+
+    def order() :
+        bands = rng.sample(range(box), box)
+        return [band * box + i for band in bands for i in rng.sample(range(box), box)]
+
+    rows = order()
+    cols = order()
+    labels = [0] + rng.sample(range(1, size + 1), size)
+
+    board = [[sudoku[row][col] for col in cols] for row in rows]
+    if rng.random() < 0.5 :
+        board = [list(line) for line in zip(*board)]
+    return [[labels[x] if type(x) is int else "X" for x in line] for line in board]
+
+
+@pytest.mark.parametrize("name, sudoku", PUZZLES)
+def test_equivalent_puzzles_share_the_canonical_form(name, sudoku) :
+    rng = random.Random(name)
+    canonical, transform = canonical_form(sudoku)
+    for i in range(ROUNDS) :
+        assert canonical_form(shuffle_board(sudoku, rng))[0] == canonical
+
+
+@pytest.mark.parametrize("name, sudoku", PUZZLES + HEAVY)
+def test_invert_transform_round_trips(name, sudoku) :
+    rng = random.Random(name)
+    for board in [sudoku] + [shuffle_board(sudoku, rng) for i in range(ROUNDS)] :
+        geo = get_geometry(int(len(board) ** 0.5))
+        flat = board2flat(board)
+        canonical, transform = canonical_form(board, geo)
+        assert apply_transform(flat, transform, geo) == canonical
+        assert invert_transform(canonical, transform, geo) == flat
+        assert flat2board(invert_transform(canonical, transform, geo), geo) == board
+
+
+@pytest.mark.parametrize("name, sudoku", HEAVY)
+def test_heavy_boards_only_relabel(name, sudoku) :
+    geo = get_geometry(3)
+    assert canonical_form(sudoku, geo) == relabel_form(board2flat(sudoku), geo)
+
+
+def test_big_boards_only_relabel() :
+    rng = random.Random(16)
+    geo = get_geometry(4)
+    flat = [0] * geo.cells
+    for idx in rng.sample(range(geo.cells), 40) :
+        flat[idx] = rng.randint(1, geo.size)
+    board = flat2board(flat, geo)
+    labels = [0] + rng.sample(range(1, geo.size + 1), geo.size)
+    relabeled = [[labels[x] if type(x) is int else "X" for x in line] for line in board]
+
+    canonical, transform = canonical_form(board, geo)
+    assert canonical_form(relabeled, geo)[0] == canonical
+    assert invert_transform(canonical, transform, geo) == flat
+
+
+def test_different_puzzles_have_different_forms() :
+    forms = {tuple(canonical_form(sudoku)[0]) for name, sudoku in PUZZLES if len(sudoku) == 9}
+    assert len(forms) == len([name for name, sudoku in PUZZLES if len(sudoku) == 9])
@@ -0,0 +1,158 @@
+import math
+from engines_A20463413 import DEFAULT_ENGINE, solve
+from geometry_A20463413 import get_geometry
+from symmetry_A20463413 import board2flat
+
+# numpy is optional and only this engine needs it, it is imported by available() the first time the engine is used
+# (importing it takes longer than solving a typical puzzle)
+np = None
+
+
+# Is the vectorized engine available?
+# Imports numpy the first time, returns False if it isn't installed
+def available() :
+    global np
+    if np is None :
+        try :
+            import numpy
+        except ImportError :
+            return False
+        np = numpy
+
+    return True
+
+
+# Per board size arrays used by propagate_all() --- { box : (units, cell units, mask dtype, full mask) }
+_tables = {}
+
+
+# Returns (units, cell units, mask dtype, full mask) for a Geometry, building them the first time
+# units => (number of units, size) array of the cells in every unit
+# cell units => (cells, 3) array of the row, column and box unit of every cell
+# geo => Geometry object for the board size
+def get_tables(geo) :
+    if geo.box not in _tables :
+        if not available() :
+            raise ImportError("the vectorized engine needs numpy")
+        dtype = np.uint16 if geo.size <= 16 else np.uint32
+        _tables[geo.box] = (np.array(geo.units, dtype=np.intp), np.array(geo.cell_units, dtype=np.intp), dtype, dtype(geo.full))
+
+    return _tables[geo.box]
+
+
+# For every unit of every puzzle, which values show up at least once and which at least twice
+# Returns (once, twice), both (puzzles, units) masks
+# masks => (puzzles, units, size) masks of the cells in every unit
+def once_twice(masks) :
+    once = np.zeros(masks.shape[:2], dtype=masks.dtype)
+    twice = np.zeros_like(once)
+    for k in range(masks.shape[2]) :
+        m = masks[:, :, k]
+        twice |= once & m
+        once |= m
+
+    return once, twice
+
+
+# Combine a per unit mask into a per cell mask (the OR over the row, column and box of each cell)
+# unitMasks => (puzzles, units) masks
+# cellUnits => (cells, 3) array from get_tables()
+def cell_masks(unitMasks, cellUnits) :
+    return unitMasks[:, cellUnits[:, 0]] | unitMasks[:, cellUnits[:, 1]] | unitMasks[:, cellUnits[:, 2]]
+
+
+# Apply elimination, naked singles and hidden singles to every puzzle at once until none of them changes
+# Returns (values, dead), values is the (puzzles, cells) array after propagation and dead[i] is True if puzzle i
+# was shown to have no solution
+# values => (puzzles, cells) uint8 array of the placed values (0 = empty), updated in place
+# geo => Geometry object for the board size
+def propagate_all(values, geo) :
+    units, cellUnits, dtype, full = get_tables(geo)
+    n = values.shape[0]
+    dead = np.zeros(n, dtype=bool)
+    cand = np.full(values.shape, full, dtype=dtype)
+    one = dtype(1)
+
+    while True :
+        empty = values == 0
+        shifts = np.where(empty, 0, values.astype(dtype) - one)
+        bits = np.where(empty, dtype(0), np.left_shift(one, shifts).astype(dtype))
+
+        # Values used in every unit, a value placed twice in a unit means there is no solution
+        used, twice = once_twice(bits[:, units])
+        dead |= (twice != 0).any(axis=1)
+
+        # Elimination --- remove the values used in the row, column or box of every empty cell
+        cand = np.where(empty, cand & ~cell_masks(used, cellUnits), bits)
+        dead |= (empty & (cand == 0)).any(axis=1)
+
+        # Hidden singles --- values with exactly one place left in a unit
+        emptyCand = np.where(empty, cand, dtype(0))
+        places, morePlaces = once_twice(emptyCand[:, units])
+        dead |= ((places | used) != full).any(axis=1) # A value with nowhere to go
+        hidden = cell_masks(places & ~morePlaces, cellUnits) & emptyCand
+        dead |= ((hidden & (hidden - one)) != 0).any(axis=1) # A cell that has to hold two values
+        forced = np.where(hidden != 0, hidden, cand)
+
+        # Naked singles (and the hidden ones, which are singles now too)
+        single = empty & (forced != 0) & ((forced & (forced - one)) == 0) & ~dead[:, None]
+        if not single.any() :
+            break
+
+        values[single] = (np.log2(forced[single]).astype(np.uint8) + 1)
+        cand = forced
+
+    return values, dead
+
+
+# Solve many puzzles of the same size at once: propagate_all() on all of them,
+# then the scalar engine on every puzzle that propagation alone didn't finish
+# Returns a list of (solution, nodes) like engines_A20463413.solve(), in input order
+# (nodes is 0 for the puzzles finished by propagation)
+# sudokus => list of 2d array sudoku boards
+# engine => name of the solver in ENGINES for the puzzles that stall
+# time_limit => seconds each stalled puzzle may take (None = no limit)
+# node_limit => nodes each stalled puzzle may generate (None = no limit)
+def solve_vectorized(sudokus, engine=DEFAULT_ENGINE, time_limit=None, node_limit=None) :
+    results, stalled = propagate_batch(sudokus)
+    for i, board in stalled :
+        results[i] = solve(board, engine, time_limit, node_limit)
+
+    return results
+
+
+# Propagate many puzzles of the same size at once
+# Returns (results, stalled), results holds (solution, 0) for every puzzle that propagation solved or showed
+# to have no solution (solution = -1) and None for the others, stalled is a list of (position, 2d board after
+# propagation) for the others
+# sudokus => list of 2d array sudoku boards, or a (puzzles, cells) uint8 array of their values (0 = empty)
+#            like packed_A20463413.values_array() returns, which is updated in place
+def propagate_batch(sudokus) :
+    if not available() :
+        raise ImportError("the vectorized engine needs numpy")
+    if len(sudokus) == 0 :
+        return [], []
+
+    if isinstance(sudokus, np.ndarray) :
+        values = sudokus
+        size = math.isqrt(values.shape[1])
+    else :
+        values = np.array([board2flat(sudoku) for sudoku in sudokus], dtype=np.uint8)
+        size = len(sudokus[0])
+    geo = get_geometry(math.isqrt(size))
+    values, dead = propagate_all(values, geo)
+
+    boards = values.reshape(len(sudokus), size, size).tolist()
+    done = (values != 0).all(axis=1)
+    results = []
+    stalled = []
+    for i in range(len(values)) :
+        if dead[i] :
+            results.append((-1, 0))
+        elif done[i] :
+            results.append((boards[i], 0))
+        else :
+            results.append(None)
+            stalled.append((i, [[x or "X" for x in row] for row in boards[i]]))
+
+    return results, stalled